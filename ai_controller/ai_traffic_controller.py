@@ -11,20 +11,23 @@ import json
 import numpy as np
 import matplotlib.pyplot as plt
 from datetime import datetime
-import traci
 import sumolib
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from dqn_traffic_ai import TrafficSignalController
-from sumo_ai_integration import SUMOAIIntegration
+# Same binding as the integration (libsumo when USE_LIBSUMO=1, TraCI otherwise)
+from sumo_ai_integration import SUMOAIIntegration, traci
 
 class AITrafficController:
     """
     Real-time AI traffic signal controller
     """
     
+    # Action id -> name, in the order of the DQN output layer
+    ACTION_NAMES = ('extend_green_5s', 'extend_green_10s', 'switch_to_ew', 'switch_to_ns')
+    
     def __init__(self, sumo_config: str, model_path: str = None):
         """
         Initialize AI traffic controller
@@ -158,8 +161,7 @@ class AITrafficController:
             metrics = self.sumo_ai.get_traffic_state()
             
             # Print decision info
-            action_names = ['extend_green_5s', 'extend_green_10s', 'switch_to_ew', 'switch_to_ns']
-            print(f"🤖 AI Decision: {action_names[action]} | "
+            print(f"🤖 AI Decision: {self.ACTION_NAMES[action]} | "
                   f"Vehicles: {metrics['total_vehicles']} | "
                   f"Waiting: {metrics['total_waiting_time']:.1f}s | "
                   f"Phase: {metrics['current_phase']}")
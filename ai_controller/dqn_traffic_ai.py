@@ -10,7 +10,6 @@ import torch.nn as nn
 import torch.optim as optim
 import torch.nn.functional as F
 import random
-from collections import deque
 import json
 import time
 from typing import Dict, List, Tuple, Optional
@@ -50,23 +49,37 @@ class DQNTrafficAI(nn.Module):
 class ReplayBuffer:
     """
     Experience replay buffer for DQN training
+    
+    Stored as preallocated structure-of-arrays ring buffer so that sampling a
+    minibatch is one fancy-index gather per field.
     """
     
-    def __init__(self, capacity: int = 10000):
-        self.buffer = deque(maxlen=capacity)
+    def __init__(self, capacity: int = 10000, state_size: int = 8):
+        self.capacity = capacity
+        self.states = np.zeros((capacity, state_size), dtype=np.float32)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros((capacity, state_size), dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=np.bool_)
+        self._count = 0  # Total experiences pushed (write cursor = _count % capacity)
     
     def push(self, state, action, reward, next_state, done):
         """Add experience to buffer"""
-        self.buffer.append((state, action, reward, next_state, done))
+        i = self._count % self.capacity
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        self._count += 1
     
     def sample(self, batch_size: int):
-        """Sample random batch from buffer"""
-        batch = random.sample(self.buffer, batch_size)
-        state, action, reward, next_state, done = map(np.stack, zip(*batch))
-        return state, action, reward, next_state, done
+        """Sample random batch from buffer (uniform with replacement, O(batch_size))"""
+        idx = np.random.randint(0, len(self), batch_size)
+        return self.states[idx], self.actions[idx], self.rewards[idx], self.next_states[idx], self.dones[idx]
     
     def __len__(self):
-        return len(self.buffer)
+        return min(self._count, self.capacity)
 
 class TrafficSignalController:
     """
@@ -93,13 +106,17 @@ class TrafficSignalController:
         self.epsilon_decay = epsilon_decay
         self.batch_size = batch_size
         
-        # Neural networks
-        self.q_network = DQNTrafficAI(state_size, action_size)
-        self.target_network = DQNTrafficAI(state_size, action_size)
+        # Neural networks (on GPU when available)
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.q_network = DQNTrafficAI(state_size, action_size).to(self.device)
+        self.target_network = DQNTrafficAI(state_size, action_size).to(self.device)
         self.optimizer = optim.Adam(self.q_network.parameters(), lr=learning_rate)
         
         # Experience replay
-        self.memory = ReplayBuffer(memory_size)
+        self.memory = ReplayBuffer(memory_size, state_size)
+        
+        # Side CUDA stream so replay training can overlap with the SUMO step
+        self._ai_stream = torch.cuda.Stream() if self.device.type == "cuda" else None
         
         # Training metrics
         self.training_metrics = {
@@ -132,37 +149,35 @@ class TrafficSignalController:
         Returns:
             State vector as numpy array
         """
-        # Extract vehicle counts per direction
-        vehicles_north = sumo_data.get('vehicles_north', 0)
-        vehicles_south = sumo_data.get('vehicles_south', 0)
-        vehicles_east = sumo_data.get('vehicles_east', 0)
-        vehicles_west = sumo_data.get('vehicles_west', 0)
-        
-        # Current traffic light phase (0: NS green, 1: EW green)
-        current_phase = sumo_data.get('current_phase', 0)
+        state = np.empty(self.state_size, dtype=np.float32)
+        self.get_state_into(sumo_data, state)
+        return state
+    
+    def get_state_into(self, sumo_data: Dict, out: np.ndarray) -> None:
+        """
+        Write the normalized state vector into a preallocated float32 buffer
         
-        # Time since last phase change
-        elapsed_time = sumo_data.get('elapsed_time', 0)
+        Args:
+            sumo_data: Dictionary containing SUMO simulation data
+            out: Destination array of length state_size
+        """
+        # Vehicle counts per direction (normalize to max 20 vehicles)
+        out[0] = sumo_data.get('vehicles_north', 0) / 20.0
+        out[1] = sumo_data.get('vehicles_south', 0) / 20.0
+        out[2] = sumo_data.get('vehicles_east', 0) / 20.0
+        out[3] = sumo_data.get('vehicles_west', 0) / 20.0
         
-        # Average queue length
-        queue_length = sumo_data.get('queue_length', 0)
+        # Current traffic light phase (0: NS green, 1: EW green)
+        out[4] = sumo_data.get('current_phase', 0)
         
-        # Average vehicle speed
-        avg_speed = sumo_data.get('avg_speed', 0)
+        # Time since last phase change (normalize to max 60 seconds)
+        out[5] = sumo_data.get('elapsed_time', 0) / 60.0
         
-        # Normalize values
-        state = np.array([
-            vehicles_north / 20.0,  # Normalize to max 20 vehicles
-            vehicles_south / 20.0,
-            vehicles_east / 20.0,
-            vehicles_west / 20.0,
-            current_phase,
-            elapsed_time / 60.0,  # Normalize to max 60 seconds
-            queue_length / 50.0,  # Normalize to max 50 vehicles
-            avg_speed / 30.0  # Normalize to max 30 m/s
-        ], dtype=np.float32)
+        # Average queue length (normalize to max 50 vehicles)
+        out[6] = sumo_data.get('queue_length', 0) / 50.0
         
-        return state
+        # Average vehicle speed (normalize to max 30 m/s)
+        out[7] = sumo_data.get('avg_speed', 0) / 30.0
     
     def select_action(self, state: np.ndarray, training: bool = True) -> int:
         """
@@ -178,8 +193,9 @@ class TrafficSignalController:
         if training and random.random() < self.epsilon:
             return random.randrange(self.action_size)
         
+        self.wait_for_replay()
         with torch.no_grad():
-            state_tensor = torch.FloatTensor(state).unsqueeze(0)
+            state_tensor = torch.as_tensor(state, dtype=torch.float32, device=self.device).unsqueeze(0)
             q_values = self.q_network(state_tensor)
             return q_values.argmax().item()
     
@@ -187,20 +203,44 @@ class TrafficSignalController:
         """Store experience in replay buffer"""
         self.memory.push(state, action, reward, next_state, done)
     
-    def replay(self):
-        """Train the network on a batch of experiences"""
+    def replay(self, sync: bool = True):
+        """
+        Train the network on a batch of experiences
+        
+        Args:
+            sync: Wait for the training step and return the loss as a float.
+                  With sync=False on CUDA the step is queued on a side stream and
+                  the loss tensor is returned without blocking the caller.
+        """
         if len(self.memory) < self.batch_size:
             return 0.0
         
+        if self._ai_stream is None:
+            loss = self._train_batch()
+        else:
+            with torch.cuda.stream(self._ai_stream):
+                loss = self._train_batch()
+            if sync:
+                self.wait_for_replay()
+        
+        return loss.item() if sync else loss
+    
+    def wait_for_replay(self):
+        """Order subsequent work on the current CUDA stream after queued replay steps"""
+        if self._ai_stream is not None:
+            torch.cuda.current_stream().wait_stream(self._ai_stream)
+    
+    def _train_batch(self) -> torch.Tensor:
+        """Run one optimisation step on a sampled minibatch"""
         # Sample batch from memory
         states, actions, rewards, next_states, dones = self.memory.sample(self.batch_size)
         
-        # Convert to tensors
-        states = torch.FloatTensor(states)
-        actions = torch.LongTensor(actions)
-        rewards = torch.FloatTensor(rewards)
-        next_states = torch.FloatTensor(next_states)
-        dones = torch.BoolTensor(dones)
+        # Convert to tensors (zero-copy views of the sampled arrays)
+        states = torch.from_numpy(states).to(self.device, non_blocking=True)
+        actions = torch.from_numpy(actions).to(self.device, non_blocking=True)
+        rewards = torch.from_numpy(rewards).to(self.device, non_blocking=True)
+        next_states = torch.from_numpy(next_states).to(self.device, non_blocking=True)
+        dones = torch.from_numpy(dones).to(self.device, non_blocking=True)
         
         # Current Q values
         current_q_values = self.q_network(states).gather(1, actions.unsqueeze(1))
@@ -222,14 +262,16 @@ class TrafficSignalController:
         if self.epsilon > self.epsilon_min:
             self.epsilon *= self.epsilon_decay
         
-        return loss.item()
+        return loss.detach()
     
     def update_target_network(self):
         """Update target network with current network weights"""
+        self.wait_for_replay()
         self.target_network.load_state_dict(self.q_network.state_dict())
     
     def save_model(self, filepath: str):
         """Save the trained model"""
+        self.wait_for_replay()
         torch.save({
             'q_network_state_dict': self.q_network.state_dict(),
             'target_network_state_dict': self.target_network.state_dict(),
@@ -242,7 +284,7 @@ class TrafficSignalController:
     def load_model(self, filepath: str):
         """Load a trained model"""
         if os.path.exists(filepath):
-            checkpoint = torch.load(filepath)
+            checkpoint = torch.load(filepath, map_location=self.device)
             self.q_network.load_state_dict(checkpoint['q_network_state_dict'])
             self.target_network.load_state_dict(checkpoint['target_network_state_dict'])
             self.optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
@@ -252,6 +294,21 @@ class TrafficSignalController:
         else:
             print(f"❌ Model file not found: {filepath}")
     
+    def quantize_for_inference(self):
+        """
+        Convert the Q-network's Linear layers to dynamic int8 for faster inference
+        
+        Only for inference: the quantized network cannot be trained further.
+        Dynamic quantization is CPU-only, so GPU models are left untouched.
+        """
+        if self.device.type != "cpu":
+            return
+        self.q_network.eval()
+        self.q_network = torch.ao.quantization.quantize_dynamic(
+            self.q_network, {nn.Linear}, dtype=torch.qint8
+        )
+        print("✅ Q-network quantized to int8 for inference")
+    
     def get_action_description(self, action: int) -> str:
         """Get human-readable action description"""
         return self.action_map.get(action, "unknown_action")
@@ -11,7 +11,7 @@ from datetime import datetime
 from typing import Dict, List, Optional
 import os
 from dqn_traffic_ai import TrafficSignalController
-from sumo_ai_integration import SUMOAIIntegration
+from sumo_ai_integration import SUMOAIIntegration, traci  # libsumo or TraCI, matching the integration
 
 class RealTimeAIController:
     """
@@ -117,7 +117,6 @@ class RealTimeAIController:
         # Close SUMO connection
         if self.sumo_ai:
             try:
-                import traci
                 traci.close()
             except:
                 pass
@@ -153,7 +152,6 @@ class RealTimeAIController:
                 self._update_dashboard_data(state, action, reward)
                 
                 # Advance simulation
-                import traci
                 traci.simulationStep()
                 
                 # Print status
@@ -188,7 +186,7 @@ class RealTimeAIController:
     
     def _update_dashboard_data(self, state: Dict, action: int, reward: float):
         """Update dashboard data"""
-        self.dashboard_data['current_state'] = state
+        self.dashboard_data['current_state'] = state._asdict()
         self.dashboard_data['performance_metrics'] = {
             'avg_waiting_time': np.mean(self.performance_data['waiting_times'][-10:]) if self.performance_data['waiting_times'] else 0,
             'avg_throughput': np.mean(self.performance_data['throughputs'][-10:]) if self.performance_data['throughputs'] else 0,
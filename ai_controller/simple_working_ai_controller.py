@@ -9,12 +9,38 @@ import time
 import numpy as np
 import traci
 import subprocess
+from types import MappingProxyType
 from typing import Dict, List, Tuple
 import matplotlib.pyplot as plt
 
 # Add current directory to path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+STATE_KEYS = (
+    'north_vehicles', 'south_vehicles', 'east_vehicles', 'west_vehicles',
+    'total_vehicles', 'total_waiting_time', 'avg_speed', 'queue_length', 'vehicles_passed'
+)
+METRIC_KEYS = ('total_waiting_time', 'total_vehicles', 'total_queue_length', 'avg_speed')
+
+def _decide(current_phase: int, phase_duration: float, ns_traffic: int, ew_traffic: int,
+            min_phase_time: float, max_phase_time: float) -> int:
+    """
+    Branchless rule-based decision for one intersection.
+    
+    Equivalent to the keep/switch/extend ladder: never act before the minimum
+    phase time, switch when the opposing approach leads by more than 2 vehicles,
+    otherwise extend green while the served approach still has traffic.
+    """
+    # Phases 0/2 serve North-South, phases 1/3 serve East-West
+    is_ns = (current_phase == 0) | (current_phase == 2)
+    is_ew = (current_phase == 1) | (current_phase == 3)
+    
+    ready = phase_duration >= min_phase_time
+    switch = (is_ns & (ew_traffic > ns_traffic + 2)) | (is_ew & (ns_traffic > ew_traffic + 2))
+    extend = (phase_duration < max_phase_time) & ((is_ns & (ns_traffic > 0)) | (is_ew & (ew_traffic > 0)))
+    
+    return int(ready) * (int(switch) + (1 - int(switch)) * int(extend) * 2)
+
 class SimpleWorkingAIController:
     """
     Simple AI controller for multiple intersections with basic traffic management
@@ -41,6 +67,14 @@ class SimpleWorkingAIController:
                 'vehicles_passed': 0
             }
         
+        # Reusable per-junction state dicts and metrics dict (mutated in place each tick)
+        self._state_dicts = {jid: dict.fromkeys(STATE_KEYS, 0) for jid in junction_ids}
+        self._metrics_dict = dict.fromkeys(METRIC_KEYS, 0)
+        
+        # Shared read-only results for ticks with no vehicles in the network
+        self._zero_state = MappingProxyType(dict.fromkeys(STATE_KEYS, 0))
+        self._zero_metrics = MappingProxyType(dict.fromkeys(METRIC_KEYS, 0))
+        
         # Global coordination parameters
         self.coordination_delay = 5.0  # Delay between intersection switches
         self.last_switch_time = 0
@@ -155,6 +189,8 @@ class SimpleWorkingAIController:
         try:
             # Get vehicles in the intersection area
             vehicles = traci.vehicle.getIDList()
+            if not vehicles:
+                return self._zero_state
             
             # Count vehicles approaching each direction
             north_vehicles = 0
@@ -203,24 +239,24 @@ class SimpleWorkingAIController:
             avg_speed = total_speed / vehicle_count if vehicle_count > 0 else 0
             queue_length = north_vehicles + south_vehicles + east_vehicles + west_vehicles
             
-            return {
-                'north_vehicles': north_vehicles,
-                'south_vehicles': south_vehicles,
-                'east_vehicles': east_vehicles,
-                'west_vehicles': west_vehicles,
-                'total_vehicles': vehicle_count,
-                'total_waiting_time': total_waiting_time,
-                'avg_speed': avg_speed,
-                'queue_length': queue_length,
-                'vehicles_passed': 0  # Will be calculated in update_metrics
-            }
+            state = self._state_dicts[junction_id]
+            state['north_vehicles'] = north_vehicles
+            state['south_vehicles'] = south_vehicles
+            state['east_vehicles'] = east_vehicles
+            state['west_vehicles'] = west_vehicles
+            state['total_vehicles'] = vehicle_count
+            state['total_waiting_time'] = total_waiting_time
+            state['avg_speed'] = avg_speed
+            state['queue_length'] = queue_length
+            state['vehicles_passed'] = 0  # Will be calculated in update_metrics
+            return state
             
         except Exception as e:
             print(f"⚠️ Error getting state for {junction_id}: {e}")
-            return {
-                'north_vehicles': 0, 'south_vehicles': 0, 'east_vehicles': 0, 'west_vehicles': 0,
-                'total_vehicles': 0, 'total_waiting_time': 0, 'avg_speed': 0, 'queue_length': 0, 'vehicles_passed': 0
-            }
+            state = self._state_dicts[junction_id]
+            for key in STATE_KEYS:
+                state[key] = 0
+            return state
     
     def coordinate_intersections(self) -> List[Tuple[str, int]]:
         """Simple coordination logic for all intersections"""
@@ -240,34 +276,16 @@ class SimpleWorkingAIController:
     def _simple_decision_logic(self, junction_id: str, state: Dict, current_time: float) -> int:
         """Simple decision logic for traffic control"""
         controller = self.controllers[junction_id]
-        current_phase = controller['current_phase']
-        phase_duration = current_time - controller['phase_start_time']
         
         # Actions: 0=keep_current, 1=switch_phase, 2=extend_green_5s, 3=extend_green_10s
-        
-        # Don't switch too frequently
-        if phase_duration < controller['min_phase_time']:
-            return 0  # Keep current phase
-        
-        # Check if we should switch based on traffic
-        north_south_traffic = state['north_vehicles'] + state['south_vehicles']
-        east_west_traffic = state['east_vehicles'] + state['west_vehicles']
-        
-        # If current phase is North-South (0 or 2) and East-West has more traffic
-        if current_phase in [0, 2] and east_west_traffic > north_south_traffic + 2:
-            return 1  # Switch to East-West
-        # If current phase is East-West (1 or 3) and North-South has more traffic
-        elif current_phase in [1, 3] and north_south_traffic > east_west_traffic + 2:
-            return 1  # Switch to North-South
-        
-        # Extend green if there's still traffic
-        if phase_duration < controller['max_phase_time']:
-            if current_phase in [0, 2] and north_south_traffic > 0:
-                return 2  # Extend green 5s
-            elif current_phase in [1, 3] and east_west_traffic > 0:
-                return 2  # Extend green 5s
-        
-        return 0  # Keep current phase
+        return _decide(
+            controller['current_phase'],
+            current_time - controller['phase_start_time'],
+            state['north_vehicles'] + state['south_vehicles'],
+            state['east_vehicles'] + state['west_vehicles'],
+            controller['min_phase_time'],
+            controller['max_phase_time']
+        )
     
     def execute_intersection_action(self, junction_id: str, action: int):
         """Execute action for a specific intersection"""
@@ -300,17 +318,20 @@ class SimpleWorkingAIController:
     
     def update_metrics(self, states: Dict) -> Dict:
         """Update performance metrics"""
-        total_waiting_time = sum(state.get('total_waiting_time', 0) for state in states.values())
         total_vehicles = sum(state.get('total_vehicles', 0) for state in states.values())
+        if total_vehicles == 0:
+            return self._zero_metrics
+        
+        total_waiting_time = sum(state.get('total_waiting_time', 0) for state in states.values())
         total_queue_length = sum(state.get('queue_length', 0) for state in states.values())
         avg_speed = np.mean([state.get('avg_speed', 0) for state in states.values()])
         
-        return {
-            'total_waiting_time': total_waiting_time,
-            'total_vehicles': total_vehicles,
-            'total_queue_length': total_queue_length,
-            'avg_speed': avg_speed
-        }
+        metrics = self._metrics_dict
+        metrics['total_waiting_time'] = total_waiting_time
+        metrics['total_vehicles'] = total_vehicles
+        metrics['total_queue_length'] = total_queue_length
+        metrics['avg_speed'] = avg_speed
+        return metrics
     
     def print_status(self, current_time: float, states: Dict, metrics: Dict):
         """Print current status"""
@@ -354,8 +375,8 @@ class SimpleWorkingAIController:
                 if int(current_time) % 30 == 0:
                     self.print_status(current_time, states, metrics)
                 
-                # Advance simulation
-                traci.simulationStep()
+                # Advance SUMO straight to the next control tick in a single TraCI call
+                traci.simulationStep(current_time + control_interval)
                 
                 # Control interval
                 time.sleep(control_interval / 10.0)  # Scale down for faster simulation
@@ -4,15 +4,182 @@ SUMO AI Integration Module
 Connects DQN AI with SUMO simulation via TraCI
 """
 
-import traci
+import os
+import logging
 import sumolib
 import numpy as np
 import time
 import json
-from typing import Dict, List, Tuple, Optional
-import os
+import multiprocessing as mp
+import queue
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Tuple, Optional, Union
+from traci import constants as tc
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """Fallback decorator so kernels run as plain Python without Numba"""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
 from dqn_traffic_ai import TrafficSignalController, TrafficMetrics
 
+# Libsumo runs SUMO in-process (no TCP round-trip per call) and exposes the same
+# API used here. It cannot drive sumo-gui or serve multiple clients, so it is opt-in.
+if os.environ.get('USE_LIBSUMO') == '1':
+    import libsumo as traci
+else:
+    import traci
+
+# Per-step diagnostics go through logging (silent unless the application configures it)
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+# Per-vehicle variables fetched in one subscription round-trip each step
+VEHICLE_SUBSCRIPTION_VARS = [tc.VAR_SPEED, tc.VAR_WAITING_TIME, tc.VAR_LANE_ID]
+
+# Table-driven action dispatch: action index -> (operation, argument).
+# Extend actions carry the duration in seconds, switch actions the target phase.
+_EXTEND, _SWITCH = 0, 1
+_ACTION_TABLE = (
+    (_EXTEND, 5.0),   # extend_green_5s
+    (_EXTEND, 10.0),  # extend_green_10s
+    (_SWITCH, 1),     # switch_to_ew
+    (_SWITCH, 0)      # switch_to_ns
+)
+
+# Green phase -> green group (0: NS, 1: EW); group ids match the switch targets
+_PHASE_GROUP = {0: 0, 2: 0, 1: 1, 3: 1}
+_GROUP_NAMES = ("NS", "EW")
+
+# Maximum number of cached greedy decisions (LRU evicted beyond this)
+MAT_MAX_ENTRIES = 4096
+
+# Seconds the parallel-training learner waits for a transition before checking its workers
+WORKER_POLL_TIMEOUT = 5.0
+
+# Direction indices used by the lane -> direction table
+DIRECTIONS = ('north', 'south', 'east', 'west')
+
+def _lane_direction(lane_id: str) -> int:
+    """Classify a lane by the direction name in its ID (-1 if none)"""
+    lane_id = lane_id.lower()
+    for idx, direction in enumerate(DIRECTIONS):
+        if direction in lane_id:
+            return idx
+    return -1
+
+class TrafficState(NamedTuple):
+    """
+    Fixed-layout traffic state snapshot produced by get_traffic_state
+    
+    Fields are read by attribute in the hot path; get() and string indexing
+    keep existing dict-style callers working.
+    """
+    vehicles_north: int
+    vehicles_south: int
+    vehicles_east: int
+    vehicles_west: int
+    current_phase: int
+    elapsed_time: float
+    queue_length: int
+    avg_speed: float
+    total_vehicles: int
+    vehicles_passed: int
+    total_waiting_time: float
+    avg_waiting_time: float
+    
+    def get(self, key: str, default=None):
+        """Dict-style field lookup"""
+        return getattr(self, key, default)
+    
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+@njit(cache=True, fastmath=True)
+def _aggregate_kernel(speeds: np.ndarray, waits: np.ndarray, lane_dirs: np.ndarray):
+    """
+    Single-pass aggregation of per-vehicle columns into the traffic state scalars
+    
+    Returns (north, south, east, west, queue_length, vehicles_passed,
+    total_waiting_time, avg_speed); lane_dirs holds DIRECTIONS indices or -1.
+    """
+    vehicles_north = 0
+    vehicles_south = 0
+    vehicles_east = 0
+    vehicles_west = 0
+    queue_length = 0
+    vehicles_passed = 0
+    total_waiting_time = 0.0
+    total_speed = 0.0
+    
+    n = speeds.shape[0]
+    for i in range(n):
+        direction = lane_dirs[i]
+        if direction == 0:
+            vehicles_north += 1
+        elif direction == 1:
+            vehicles_south += 1
+        elif direction == 2:
+            vehicles_east += 1
+        elif direction == 3:
+            vehicles_west += 1
+        
+        speed = speeds[i]
+        if speed < 1.0:
+            queue_length += 1
+        if speed > 5.0:  # Moving at reasonable speed
+            vehicles_passed += 1
+        total_waiting_time += waits[i]
+        total_speed += speed
+    
+    avg_speed = total_speed / n if n > 0 else 0.0
+    return (vehicles_north, vehicles_south, vehicles_east, vehicles_west,
+            queue_length, vehicles_passed, total_waiting_time, avg_speed)
+
+@njit(cache=True, fastmath=True)
+def _reward_kernel(total_waiting_time: float, vehicles_passed: float, queue_length: float,
+                   avg_speed: float, total_vehicles: float, action: int) -> float:
+    """Scalar reward computation (compiled to native code when Numba is installed)"""
+    # Reward components
+    # 1. Penalty for waiting time (higher penalty for more waiting)
+    waiting_penalty = -total_waiting_time * 0.01
+    
+    # 2. Reward for vehicles passing through
+    throughput_reward = vehicles_passed * 2.0
+    
+    # 3. Penalty for queue length
+    queue_penalty = -queue_length * 0.5
+    
+    # 4. Reward for maintaining good speed
+    speed_reward = avg_speed * 0.1 if avg_speed > 5.0 else 0.0
+    
+    # 5. Penalty for frequent switching (to avoid oscillation)
+    switching_penalty = -0.5 if action == 2 or action == 3 else 0.0
+    
+    # 6. Bonus for clearing traffic
+    clear_bonus = 5.0 if queue_length == 0 and total_vehicles > 0 else 0.0
+    
+    # 7. Penalty for having too many vehicles waiting
+    congestion_penalty = -total_vehicles * 0.1 if total_vehicles > 10 else 0.0
+    
+    # Total reward
+    reward = (waiting_penalty + throughput_reward + queue_penalty + 
+             speed_reward + switching_penalty + clear_bonus + congestion_penalty)
+    
+    return reward
+
 class SUMOAIIntegration:
     """
     Integration between SUMO simulation and DQN AI
@@ -21,7 +188,8 @@ class SUMOAIIntegration:
     def __init__(self, 
                  sumo_config: str,
                  junction_id: str = "center",
-                 ai_controller: Optional[TrafficSignalController] = None):
+                 ai_controller: Optional[TrafficSignalController] = None,
+                 port: Optional[int] = None):
         """
         Initialize SUMO AI integration
         
@@ -29,15 +197,23 @@ class SUMOAIIntegration:
             sumo_config: Path to SUMO configuration file
             junction_id: ID of the traffic light junction to control
             ai_controller: DQN AI controller instance
+            port: TraCI port (needed when several SUMO instances run side by side)
         """
         self.sumo_config = sumo_config
         self.junction_id = junction_id
+        self.port = port
         self.ai_controller = ai_controller or TrafficSignalController()
         
         # SUMO connection
         self.sumo_process = None
         self.net = None
+        self.is_connected = False
         self.simulation_time = 0
+        self._lane_dir = {}  # lane_id -> index into DIRECTIONS (-1 if unclassified)
+        
+        # Simulated seconds between AI decisions; SUMO runs the steps in between
+        # without state extraction or network inference
+        self.decision_interval = 1.0
         
         # Traffic light state
         self.current_phase = 0
@@ -52,36 +228,62 @@ class SUMOAIIntegration:
             'episode_rewards': []
         }
         
+        # Memoized arbitration table: discretized state signature -> greedy action
+        self._mat: "OrderedDict[Tuple, int]" = OrderedDict()
+        
         # Phase definitions
         self.phases = {
             0: "NS_green",  # North-South green
             1: "EW_green"   # East-West green
         }
         
+        # Network topology is static, so read it once rather than per episode
+        self._load_network()
+        
         print(f"🚦 SUMO AI Integration initialized")
         print(f"   Junction ID: {junction_id}")
         print(f"   AI Controller: {'Loaded' if ai_controller else 'New'}")
     
-    def start_simulation(self):
-        """Start SUMO simulation with TraCI"""
+    def _load_network(self):
+        """Read the SUMO network and build the lane -> direction table"""
+        config_dir = os.path.dirname(self.sumo_config)
+        net_file = os.path.join(config_dir, "professional_working_network.net.xml")
+        if not os.path.exists(net_file):
+            return
+        
+        self.net = sumolib.net.readNet(net_file)
+        
+        # Lane IDs are static topology, so classify them once up front
+        for edge in self.net.getEdges():
+            for lane in edge.getLanes():
+                self._lane_dir[lane.getID()] = _lane_direction(lane.getID())
+    
+    def _sumo_options(self) -> List[str]:
+        """SUMO command-line options shared by start and load"""
+        # No per-step console output: it is flushed every step and slows training
+        return ["-c", self.sumo_config, "--start", "--no-step-log", "--no-warnings"]
+    
+    def start_simulation(self, gui: bool = False):
+        """
+        Start SUMO simulation with TraCI
+        
+        Args:
+            gui: Use sumo-gui instead of headless sumo (slower; not supported by libsumo)
+        """
         try:
+            if self.net is None:
+                config_dir = os.path.dirname(self.sumo_config)
+                print(f"❌ Network file not found: {os.path.join(config_dir, 'professional_working_network.net.xml')}")
+                return False
+            
             # Start SUMO
-            sumo_cmd = [
-                "C:\\Program Files (x86)\\Eclipse\\Sumo\\bin\\sumo.exe",
-                "-c", self.sumo_config,
-                "--start"
-            ]
-            
-            traci.start(sumo_cmd)
-            
-            # Load network
-            config_dir = os.path.dirname(self.sumo_config)
-            net_file = os.path.join(config_dir, "professional_working_network.net.xml")
-            if os.path.exists(net_file):
-                self.net = sumolib.net.readNet(net_file)
+            sumo_cmd = [sumolib.checkBinary("sumo-gui" if gui else "sumo")] + self._sumo_options()
+            
+            if self.port is not None:
+                traci.start(sumo_cmd, port=self.port)
             else:
-                print(f"❌ Network file not found: {net_file}")
-                return False
+                traci.start(sumo_cmd)
+            self.is_connected = True
             
             # Initialize traffic light
             self._initialize_traffic_light()
@@ -93,173 +295,219 @@ class SUMOAIIntegration:
             print(f"❌ Failed to start SUMO: {e}")
             return False
     
+    def reset_simulation(self):
+        """
+        Reset the simulation for a new episode
+        
+        Reloads the scenario in the already running SUMO process when connected
+        (no process spawn or network re-parse), otherwise starts SUMO.
+        """
+        if not self.is_connected:
+            return self.start_simulation()
+        
+        try:
+            traci.load(self._sumo_options())
+            self._initialize_traffic_light()
+            return True
+            
+        except Exception as e:
+            print(f"❌ Failed to reload SUMO: {e}")
+            return False
+    
     def _initialize_traffic_light(self):
         """Initialize traffic light state"""
         try:
             # Get current phase
             self.current_phase = traci.trafficlight.getPhase(self.junction_id)
-            self.phase_start_time = traci.simulation.getTime()
+            self.simulation_time = traci.simulation.getTime()
+            self.phase_start_time = self.simulation_time
             self.phase_duration = 0
             
+            # Track departures so new vehicles can be subscribed as they enter
+            traci.simulation.subscribe([tc.VAR_DEPARTED_VEHICLES_IDS, tc.VAR_ARRIVED_VEHICLES_IDS])
+            for veh_id in traci.vehicle.getIDList():
+                traci.vehicle.subscribe(veh_id, VEHICLE_SUBSCRIPTION_VARS)
+            
             print(f"🚦 Traffic light initialized - Phase: {self.current_phase}")
             
         except Exception as e:
-            print(f"❌ Error initializing traffic light: {e}")
+            logger.error("Error initializing traffic light: %s", e)
     
-    def get_traffic_state(self) -> Dict:
+    def get_traffic_state(self, sim_time: Optional[float] = None) -> Union[TrafficState, Dict]:
         """
         Extract comprehensive traffic state from SUMO
         
+        Args:
+            sim_time: Current simulation time, if already known this step
+            
         Returns:
-            Dictionary containing traffic state data
+            TrafficState snapshot (empty dict on error)
         """
         try:
-            # Get all vehicles
-            vehicle_ids = traci.vehicle.getIDList()
-            vehicles = {}
-            
-            # Categorize vehicles by direction
-            vehicles_north = 0
-            vehicles_south = 0
-            vehicles_east = 0
-            vehicles_west = 0
-            
-            total_waiting_time = 0
-            total_speed = 0
-            vehicles_passed = 0
-            
-            for veh_id in vehicle_ids:
-                try:
-                    # Get vehicle data
-                    pos = traci.vehicle.getPosition(veh_id)
-                    speed = traci.vehicle.getSpeed(veh_id)
-                    waiting_time = traci.vehicle.getWaitingTime(veh_id)
-                    lane_id = traci.vehicle.getLaneID(veh_id)
-                    
-                    # Categorize by direction based on lane
-                    if 'north' in lane_id.lower():
-                        vehicles_north += 1
-                    elif 'south' in lane_id.lower():
-                        vehicles_south += 1
-                    elif 'east' in lane_id.lower():
-                        vehicles_east += 1
-                    elif 'west' in lane_id.lower():
-                        vehicles_west += 1
-                    
-                    # Track metrics
-                    total_waiting_time += waiting_time
-                    total_speed += speed
-                    
-                    # Check if vehicle passed intersection
-                    if speed > 5.0:  # Moving at reasonable speed
-                        vehicles_passed += 1
-                    
-                    vehicles[veh_id] = {
-                        'position': pos,
-                        'speed': speed,
-                        'waiting_time': waiting_time,
-                        'lane_id': lane_id,
-                        'passed_intersection': speed > 5.0
-                    }
-                    
-                except Exception as e:
-                    continue  # Skip invalid vehicles
+            # Subscribe vehicles that entered since the last step; arrived vehicles
+            # drop out of the subscription results automatically
+            departed = traci.simulation.getSubscriptionResults().get(tc.VAR_DEPARTED_VEHICLES_IDS, ())
+            for veh_id in departed:
+                traci.vehicle.subscribe(veh_id, VEHICLE_SUBSCRIPTION_VARS)
+            
+            # All subscribed vehicle variables in a single round-trip
+            results = traci.vehicle.getAllSubscriptionResults()
+            num_vehicles = len(results)
+            
+            # Gather per-vehicle columns; directions come from the cached lane table
+            speeds = np.empty(num_vehicles, dtype=np.float64)
+            waits = np.empty(num_vehicles, dtype=np.float64)
+            lane_dirs = np.empty(num_vehicles, dtype=np.int8)
+            lane_dir = self._lane_dir
+            for i, data in enumerate(results.values()):
+                lane_id = data[tc.VAR_LANE_ID]
+                idx = lane_dir.get(lane_id)
+                if idx is None:  # e.g. internal junction lanes
+                    idx = lane_dir[lane_id] = _lane_direction(lane_id)
+                lane_dirs[i] = idx
+                speeds[i] = data[tc.VAR_SPEED]
+                waits[i] = data[tc.VAR_WAITING_TIME]
+            
+            (vehicles_north, vehicles_south, vehicles_east, vehicles_west,
+             queue_length, vehicles_passed, total_waiting_time, avg_speed) = _aggregate_kernel(speeds, waits, lane_dirs)
             
             # Get traffic light state
             current_phase = traci.trafficlight.getPhase(self.junction_id)
-            elapsed_time = traci.simulation.getTime() - self.phase_start_time
+            if sim_time is None:
+                sim_time = traci.simulation.getTime()
+            elapsed_time = sim_time - self.phase_start_time
             
             # Calculate metrics
-            avg_waiting_time = total_waiting_time / len(vehicles) if vehicles else 0
-            avg_speed = total_speed / len(vehicles) if vehicles else 0
-            queue_length = len([v for v in vehicles.values() if v['speed'] < 1.0])
-            
-            state = {
-                'vehicles_north': vehicles_north,
-                'vehicles_south': vehicles_south,
-                'vehicles_east': vehicles_east,
-                'vehicles_west': vehicles_west,
-                'current_phase': current_phase,
-                'elapsed_time': elapsed_time,
-                'queue_length': queue_length,
-                'avg_speed': avg_speed,
-                'total_vehicles': len(vehicles),
-                'vehicles_passed': vehicles_passed,
-                'total_waiting_time': total_waiting_time,
-                'avg_waiting_time': avg_waiting_time
-            }
+            avg_waiting_time = total_waiting_time / num_vehicles if num_vehicles else 0
+            
+            state = TrafficState(
+                vehicles_north=vehicles_north,
+                vehicles_south=vehicles_south,
+                vehicles_east=vehicles_east,
+                vehicles_west=vehicles_west,
+                current_phase=current_phase,
+                elapsed_time=elapsed_time,
+                queue_length=queue_length,
+                avg_speed=avg_speed,
+                total_vehicles=num_vehicles,
+                vehicles_passed=vehicles_passed,
+                total_waiting_time=total_waiting_time,
+                avg_waiting_time=avg_waiting_time
+            )
             
             return state
             
         except Exception as e:
-            print(f"❌ Error getting traffic state: {e}")
+            logger.error("Error getting traffic state: %s", e)
             return {}
     
-    def execute_action(self, action: int) -> bool:
+    def execute_action(self, action: int, sim_time: Optional[float] = None) -> bool:
         """
         Execute AI action on traffic light
         
         Args:
             action: Action index from AI controller
+            sim_time: Current simulation time, if already known this step
             
         Returns:
             True if action executed successfully
         """
         try:
-            current_time = traci.simulation.getTime()
+            current_time = sim_time if sim_time is not None else traci.simulation.getTime()
             current_phase = traci.trafficlight.getPhase(self.junction_id)
             
             # Only allow phase changes if we've been in current phase for at least 5 seconds
             min_phase_time = 5.0
             time_in_phase = current_time - self.phase_start_time
             
-            if action == 0:  # extend_green_5s
-                # Extend current green phase by 5 seconds
-                if current_phase in [0, 2]:  # NS green phases
-                    traci.trafficlight.setPhaseDuration(self.junction_id, 5.0)
-                    print(f"🟢 Extended NS green by 5s")
-                elif current_phase in [1, 3]:  # EW green phases
-                    traci.trafficlight.setPhaseDuration(self.junction_id, 5.0)
-                    print(f"🟢 Extended EW green by 5s")
-                
-            elif action == 1:  # extend_green_10s
-                # Extend current green phase by 10 seconds
-                if current_phase in [0, 2]:  # NS green phases
-                    traci.trafficlight.setPhaseDuration(self.junction_id, 10.0)
-                    print(f"🟢 Extended NS green by 10s")
-                elif current_phase in [1, 3]:  # EW green phases
-                    traci.trafficlight.setPhaseDuration(self.junction_id, 10.0)
-                    print(f"🟢 Extended EW green by 10s")
-                
-            elif action == 2:  # switch_to_ew
-                # Switch to East-West green (only if enough time has passed)
-                if time_in_phase >= min_phase_time and current_phase not in [1, 3]:
-                    traci.trafficlight.setPhase(self.junction_id, 1)
-                    self.current_phase = 1
-                    self.phase_start_time = current_time
-                    self.performance_metrics['total_switches'] += 1
-                    print(f"🔄 Switched to EW green")
-                else:
-                    print(f"⏳ Cannot switch to EW - only {time_in_phase:.1f}s in current phase")
-                
-            elif action == 3:  # switch_to_ns
-                # Switch to North-South green (only if enough time has passed)
-                if time_in_phase >= min_phase_time and current_phase not in [0, 2]:
-                    traci.trafficlight.setPhase(self.junction_id, 0)
-                    self.current_phase = 0
-                    self.phase_start_time = current_time
-                    self.performance_metrics['total_switches'] += 1
-                    print(f"🔄 Switched to NS green")
-                else:
-                    print(f"⏳ Cannot switch to NS - only {time_in_phase:.1f}s in current phase")
+            if not 0 <= action < len(_ACTION_TABLE):
+                return True
+            
+            op, arg = _ACTION_TABLE[action]
+            group = _PHASE_GROUP.get(current_phase)
+            
+            if op == _EXTEND:
+                # Extend the current green phase (NS or EW)
+                if group is not None:
+                    traci.trafficlight.setPhaseDuration(self.junction_id, arg)
+                    logger.debug("Extended %s green by %.0fs", _GROUP_NAMES[group], arg)
+            
+            # Switch to the target green (only if enough time has passed)
+            elif time_in_phase >= min_phase_time and group != arg:
+                traci.trafficlight.setPhase(self.junction_id, arg)
+                self.current_phase = arg
+                self.phase_start_time = current_time
+                self.performance_metrics['total_switches'] += 1
+                logger.debug("Switched to %s green", _GROUP_NAMES[arg])
+            else:
+                logger.debug("Cannot switch to %s - only %.1fs in current phase", _GROUP_NAMES[arg], time_in_phase)
             
             return True
             
         except Exception as e:
-            print(f"❌ Error executing action {action}: {e}")
+            logger.error("Error executing action %s: %s", action, e)
             return False
     
-    def calculate_reward(self, state: Dict, action: int) -> float:
+    def _advance_to(self, target_time: float):
+        """Advance SUMO to target_time in a single TraCI call"""
+        traci.simulationStep(target_time)
+        self.simulation_time = traci.simulation.getTime()
+        
+        # The departure subscription only reports the last step, so pick up any
+        # vehicles that entered during the skipped steps
+        subscribed = traci.vehicle.getAllSubscriptionResults()
+        for veh_id in traci.vehicle.getIDList():
+            if veh_id not in subscribed:
+                traci.vehicle.subscribe(veh_id, VEHICLE_SUBSCRIPTION_VARS)
+    
+    def _advance_accumulating(self, target_time: float, action: int) -> Tuple[float, Union[TrafficState, Dict]]:
+        """
+        Advance SUMO one step at a time to target_time for a training transition
+        
+        Every step that ends before the boundary adds its reward, discounted by
+        gamma per step, so the transition carries the return of the whole interval.
+        
+        Returns:
+            (accumulated reward, traffic state at target_time)
+        """
+        gamma = self.ai_controller.gamma
+        discount = 1.0
+        reward = 0.0
+        while True:
+            traci.simulationStep()
+            self.simulation_time = traci.simulation.getTime()
+            state = self.get_traffic_state(self.simulation_time)
+            if not state or self.simulation_time >= target_time - 1e-6:
+                return reward, state
+            discount *= gamma
+            reward += discount * self.calculate_reward(state, action)
+    
+    def _state_signature(self, state: TrafficState) -> Tuple:
+        """Discretize the network inputs into a hashable key for the decision cache"""
+        return (
+            state.vehicles_north, state.vehicles_south,
+            state.vehicles_east, state.vehicles_west,
+            state.current_phase,
+            min(int(state.elapsed_time // 5), 12),
+            int(state.queue_length // 2),
+            int(state.avg_speed // 2)
+        )
+    
+    def _select_greedy_action(self, state: TrafficState, state_vector: np.ndarray) -> int:
+        """Greedy (inference) action selection, memoized by state signature"""
+        sig = self._state_signature(state)
+        action = self._mat.get(sig)
+        if action is not None:
+            self._mat.move_to_end(sig)
+            return action
+        
+        action = self.ai_controller.select_action(state_vector, training=False)
+        self._mat[sig] = action
+        if len(self._mat) > MAT_MAX_ENTRIES:
+            self._mat.popitem(last=False)
+        return action
+    
+    def calculate_reward(self, state: TrafficState, action: int) -> float:
         """
         Calculate reward for AI action
         
@@ -270,53 +518,27 @@ class SUMOAIIntegration:
         Returns:
             Reward value
         """
-        # Get state values
-        total_waiting_time = state.get('total_waiting_time', 0)
-        vehicles_passed = state.get('vehicles_passed', 0)
-        queue_length = state.get('queue_length', 0)
-        avg_speed = state.get('avg_speed', 0)
-        total_vehicles = state.get('total_vehicles', 0)
-        
-        # Reward components
-        # 1. Penalty for waiting time (higher penalty for more waiting)
-        waiting_penalty = -total_waiting_time * 0.01
-        
-        # 2. Reward for vehicles passing through
-        throughput_reward = vehicles_passed * 2.0
-        
-        # 3. Penalty for queue length
-        queue_penalty = -queue_length * 0.5
-        
-        # 4. Reward for maintaining good speed
-        speed_reward = avg_speed * 0.1 if avg_speed > 5.0 else 0
-        
-        # 5. Penalty for frequent switching (to avoid oscillation)
-        switching_penalty = -0.5 if action in [2, 3] else 0
-        
-        # 6. Bonus for clearing traffic
-        clear_bonus = 5.0 if queue_length == 0 and total_vehicles > 0 else 0
-        
-        # 7. Penalty for having too many vehicles waiting
-        congestion_penalty = -total_vehicles * 0.1 if total_vehicles > 10 else 0
-        
-        # Total reward
-        reward = (waiting_penalty + throughput_reward + queue_penalty + 
-                 speed_reward + switching_penalty + clear_bonus + congestion_penalty)
-        
-        return reward
+        return _reward_kernel(float(state.total_waiting_time), float(state.vehicles_passed),
+                              float(state.queue_length), float(state.avg_speed),
+                              float(state.total_vehicles), int(action))
     
-    def run_ai_episode(self, max_steps: int = 1000, training: bool = True) -> Dict:
+    def run_ai_episode(self, max_steps: int = 1000, training: bool = True,
+                       close_on_exit: bool = True, transition_queue=None) -> Dict:
         """
         Run one episode of AI-controlled simulation
         
         Args:
-            max_steps: Maximum simulation steps
+            max_steps: Maximum AI decisions (each spans decision_interval seconds)
             training: Whether to train the AI
+            close_on_exit: Close the SUMO connection when the episode ends
+                           (keep it open to reload it for the next episode)
+            transition_queue: When training, send transitions to this queue for a
+                              separate learner instead of replaying locally
             
         Returns:
             Episode performance metrics
         """
-        if not self.start_simulation():
+        if not self.reset_simulation():
             return {}
         
         episode_metrics = {
@@ -328,54 +550,77 @@ class SUMOAIIntegration:
         }
         
         try:
+            # Fetch the initial state once; each step then reuses the previous next_state
+            # Two reusable state-vector buffers, swapped each step
+            state_size = self.ai_controller.state_size
+            state_vector = np.empty(state_size, dtype=np.float32)
+            next_state_vector = np.empty(state_size, dtype=np.float32)
+            
+            state = self.get_traffic_state(self.simulation_time)
+            if state:
+                self.ai_controller.get_state_into(state, state_vector)
+            
             for step in range(max_steps):
-                # Get current state
-                state = self.get_traffic_state()
                 if not state:
                     break
                 
-                # AI selects action
-                state_vector = self.ai_controller.get_state(state)
-                action = self.ai_controller.select_action(state_vector, training=training)
+                # AI selects action (greedy decisions are cached by state signature)
+                if training:
+                    action = self.ai_controller.select_action(state_vector, training=True)
+                else:
+                    action = self._select_greedy_action(state, state_vector)
                 
                 # Execute action
-                action_success = self.execute_action(action)
+                action_success = self.execute_action(action, self.simulation_time)
+                
+                # Train the AI; on CUDA the step is queued on a side stream and runs
+                # while SUMO advances (only synced when the loss is printed)
+                if (training and transition_queue is None
+                        and len(self.ai_controller.memory) > self.ai_controller.batch_size):
+                    loss = self.ai_controller.replay(sync=step % 100 == 0)
+                    if step % 100 == 0:
+                        logger.info("Step %d: Loss = %.4f", step, loss)
                 
-                # Advance simulation
-                traci.simulationStep()
-                self.simulation_time = traci.simulation.getTime()
+                # Reward of the decision step itself
+                reward = self.calculate_reward(state, action)
                 
-                # Get next state
-                next_state = self.get_traffic_state()
+                # Advance SUMO to the next decision boundary; training steps through the
+                # interval so the reward covers it (n-step return), inference skips it in one call
+                target_time = self.simulation_time + self.decision_interval
+                if training:
+                    interval_reward, next_state = self._advance_accumulating(target_time, action)
+                    reward += interval_reward
+                else:
+                    self._advance_to(target_time)
+                    next_state = self.get_traffic_state(self.simulation_time)
                 if not next_state:
                     break
-                
-                # Calculate reward
-                reward = self.calculate_reward(state, action)
+                self.ai_controller.get_state_into(next_state, next_state_vector)
                 
                 # Store experience for training
                 if training:
-                    next_state_vector = self.ai_controller.get_state(next_state)
                     done = step >= max_steps - 1
-                    self.ai_controller.remember(state_vector, action, reward, next_state_vector, done)
-                    
-                    # Train the AI
-                    if len(self.ai_controller.memory) > self.ai_controller.batch_size:
-                        loss = self.ai_controller.replay()
-                        if step % 100 == 0:
-                            print(f"Step {step}: Loss = {loss:.4f}, Reward = {reward:.2f}")
+                    if transition_queue is not None:
+                        # Copies: the queue pickles in a background thread and the buffers are reused
+                        transition_queue.put(("transition", (state_vector.copy(), action, reward,
+                                                             next_state_vector.copy(), done)))
+                    else:
+                        self.ai_controller.remember(state_vector, action, reward, next_state_vector, done)
                 
                 # Update metrics
                 episode_metrics['total_reward'] += reward
-                episode_metrics['total_waiting_time'] += state.get('avg_waiting_time', 0)
-                episode_metrics['total_vehicles_passed'] += state.get('vehicles_passed', 0)
+                episode_metrics['total_waiting_time'] += state.avg_waiting_time
+                episode_metrics['total_vehicles_passed'] += state.vehicles_passed
                 episode_metrics['steps'] = step + 1
                 
-                # Print progress
+                # Log progress
                 if step % 100 == 0:
-                    print(f"Step {step}: Vehicles = {state.get('total_vehicles', 0)}, "
-                          f"Waiting = {state.get('avg_waiting_time', 0):.2f}s, "
-                          f"Action = {self.ai_controller.get_action_description(action)}")
+                    logger.info("Step %d: Vehicles = %d, Waiting = %.2fs, Action = %s",
+                                step, state.total_vehicles, state.avg_waiting_time,
+                                self.ai_controller.get_action_description(action))
+                
+                state = next_state
+                state_vector, next_state_vector = next_state_vector, state_vector
             
             # Update target network
             if training and step % 50 == 0:
@@ -388,7 +633,8 @@ class SUMOAIIntegration:
             print(f"❌ Error in episode: {e}")
         
         finally:
-            traci.close()
+            if close_on_exit:
+                self.close()
         
         return episode_metrics
     
@@ -399,8 +645,8 @@ class SUMOAIIntegration:
         for episode in range(num_episodes):
             print(f"\n📚 Episode {episode + 1}/{num_episodes}")
             
-            # Run episode
-            metrics = self.run_ai_episode(training=True)
+            # Run episode (SUMO stays up and is reloaded between episodes)
+            metrics = self.run_ai_episode(training=True, close_on_exit=False)
             
             # Store episode metrics
             self.ai_controller.training_metrics['episode_rewards'].append(metrics['total_reward'])
@@ -413,12 +659,111 @@ class SUMOAIIntegration:
                 print(f"📊 Training Stats: Avg Reward = {stats.get('avg_reward', 0):.2f}, "
                       f"Epsilon = {stats.get('epsilon', 0):.3f}")
         
+        self.close()
         print("✅ Training completed!")
         
         # Save trained model
         model_path = "ai_controller/trained_traffic_ai.pth"
         self.ai_controller.save_model(model_path)
     
+    def run_parallel_training(self, num_episodes: int = 100, num_workers: int = 4,
+                              max_steps: int = 1000, base_port: int = 8813,
+                              sync_interval: int = 200):
+        """
+        Run training with episode rollouts spread over worker processes
+        
+        Each worker drives its own SUMO instance on base_port + rank and streams
+        transitions back; this process is the single learner that fills the
+        replay buffer, trains, and periodically broadcasts updated weights.
+        
+        Args:
+            num_episodes: Total episodes across all workers
+            num_workers: Number of rollout processes / SUMO instances
+            max_steps: Maximum AI decisions per episode
+            base_port: TraCI port of the first worker
+            sync_interval: Training steps between weight broadcasts
+        """
+        print(f"🎓 Starting parallel AI training: {num_episodes} episodes on {num_workers} workers...")
+        
+        ctx = mp.get_context("spawn")
+        transition_queue = ctx.Queue(maxsize=10000)
+        weight_queues = [ctx.Queue() for _ in range(num_workers)]
+        
+        workers = []
+        for rank in range(num_workers):
+            worker_episodes = num_episodes // num_workers + (1 if rank < num_episodes % num_workers else 0)
+            worker = ctx.Process(
+                target=_rollout_worker,
+                args=(rank, self.sumo_config, self.junction_id, base_port + rank,
+                      worker_episodes, max_steps, transition_queue, weight_queues[rank]),
+                daemon=True
+            )
+            worker.start()
+            workers.append(worker)
+        
+        # Weight queues of workers that have not reported done yet (rank -> queue)
+        live_weight_queues = dict(enumerate(weight_queues))
+        self._broadcast_weights(live_weight_queues.values())
+        
+        active_workers = num_workers
+        train_steps = 0
+        episodes_done = 0
+        while active_workers > 0:
+            try:
+                kind, payload = transition_queue.get(timeout=WORKER_POLL_TIMEOUT)
+            except queue.Empty:
+                # Nothing queued and no worker left to send anything (one died without reporting done)
+                if not any(worker.is_alive() for worker in workers):
+                    print(f"⚠️ {active_workers} rollout worker(s) exited without finishing, stopping training")
+                    break
+                continue
+            
+            if kind == "transition":
+                self.ai_controller.remember(*payload)
+                if len(self.ai_controller.memory) > self.ai_controller.batch_size:
+                    self.ai_controller.replay(sync=False)
+                    train_steps += 1
+                    if train_steps % sync_interval == 0:
+                        self._broadcast_weights(live_weight_queues.values())
+            
+            elif kind == "episode":
+                episodes_done += 1
+                self.ai_controller.training_metrics['episode_rewards'].append(payload['total_reward'])
+                self.ai_controller.training_metrics['episode_waiting_times'].append(payload['total_waiting_time'])
+                self.ai_controller.training_metrics['episode_throughputs'].append(payload['total_vehicles_passed'])
+                self.ai_controller.update_target_network()
+                
+                if episodes_done % 10 == 0:
+                    stats = self.ai_controller.get_training_stats()
+                    print(f"📊 Episodes {episodes_done}/{num_episodes}: Avg Reward = {stats.get('avg_reward', 0):.2f}, "
+                          f"Epsilon = {stats.get('epsilon', 0):.3f}")
+            
+            elif kind == "done":
+                active_workers -= 1
+                live_weight_queues.pop(payload, None)
+        
+        # Undrained weight snapshots must not keep the feeder threads (and this process) alive
+        for weight_queue in weight_queues:
+            weight_queue.close()
+            weight_queue.cancel_join_thread()
+        for worker in workers:
+            worker.join()
+        
+        print("✅ Parallel training completed!")
+        
+        # Save trained model
+        model_path = "ai_controller/trained_traffic_ai.pth"
+        self.ai_controller.save_model(model_path)
+    
+    def _broadcast_weights(self, weight_queues):
+        """Send the current Q-network weights and epsilon to the given rollout workers' queues"""
+        self.ai_controller.wait_for_replay()
+        # Cloned: on a CPU model .cpu() returns the live parameters, which the feeder thread
+        # would pickle (and workers read) while optimizer steps keep changing them
+        weights = {k: v.detach().cpu().clone() for k, v in self.ai_controller.q_network.state_dict().items()}
+        for weight_queue in weight_queues:
+            weight_queue.put((weights, self.ai_controller.epsilon))
+    
     def run_inference(self, max_steps: int = 1000):
         """Run inference with trained AI"""
         print("🚀 Running AI inference...")
@@ -426,6 +771,8 @@ class SUMOAIIntegration:
         # Load trained model
         model_path = "ai_controller/trained_traffic_ai.pth"
         self.ai_controller.load_model(model_path)
+        self.ai_controller.quantize_for_inference()
+        self._mat.clear()
         
         # Run episode without training
         metrics = self.run_ai_episode(max_steps, training=False)
@@ -437,17 +784,49 @@ class SUMOAIIntegration:
         """
         Start SUMO simulation (alias for start_simulation)
         """
-        return self.start_simulation()
+        return self.start_simulation(gui=gui)
     
     def close(self):
         """
         Close SUMO connection
         """
+        self.is_connected = False
         try:
             traci.close()
         except:
             pass
 
+def _rollout_worker(rank: int, sumo_config: str, junction_id: str, port: int,
+                    num_episodes: int, max_steps: int, transition_queue, weight_queue):
+    """Rollout process for run_parallel_training: acts with the latest learner weights"""
+    sumo_ai = None
+    try:
+        ai_controller = TrafficSignalController()
+        sumo_ai = SUMOAIIntegration(sumo_config, junction_id, ai_controller=ai_controller, port=port)
+        
+        for episode in range(num_episodes):
+            # Pick up the newest weights broadcast by the learner, if any
+            latest = None
+            try:
+                while True:
+                    latest = weight_queue.get_nowait()
+            except queue.Empty:
+                pass
+            if latest is not None:
+                weights, epsilon = latest
+                ai_controller.q_network.load_state_dict(weights)
+                ai_controller.epsilon = epsilon
+            
+            metrics = sumo_ai.run_ai_episode(max_steps, training=True, close_on_exit=False,
+                                             transition_queue=transition_queue)
+            if metrics:
+                transition_queue.put(("episode", metrics))
+    finally:
+        # Always report done, even if setup failed, so the learner does not wait on this worker
+        if sumo_ai is not None:
+            sumo_ai.close()
+        transition_queue.put(("done", rank))
+
 def main():
     """Test the SUMO AI integration"""
     print("🧠 Testing SUMO AI Integration")
@@ -8,7 +8,7 @@ import sys
 import time
 import numpy as np
 from dqn_traffic_ai import TrafficSignalController, TrafficMetrics
-from sumo_ai_integration import SUMOAIIntegration
+from sumo_ai_integration import SUMOAIIntegration, traci
 from real_time_ai_controller import RealTimeAIController
 
 def test_ai_components():
@@ -85,7 +85,6 @@ def test_ai_components():
                 success = sumo_ai.execute_action(action)
                 print(f"   ✅ Action executed: {success}")
                 
-                import traci
                 traci.close()
             else:
                 print("   ❌ Failed to start SUMO simulation")
@@ -9,18 +9,69 @@ import sys
 import time
 import json
 import numpy as np
-import matplotlib.pyplot as plt
 from datetime import datetime
-import threading
-import queue
 from collections import deque
-import traci
-import sumolib
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Sibling modules (ai_traffic_controller, ...) are imported by name; make that
+# work when this file is imported from elsewhere, without growing sys.path twice
+_MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+if _MODULE_DIR not in sys.path:
+    sys.path.insert(0, _MODULE_DIR)
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """Fallback decorator so kernels run as plain Python without Numba"""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# Faster JSON encoders for save_data and the per-step log (stdlib json otherwise)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import ujson
+    UJSON_AVAILABLE = True
+except ImportError:
+    UJSON_AVAILABLE = False
 
 from ai_traffic_controller import AITrafficController
+from sumo_ai_integration import traci  # libsumo or TraCI, as used by the controller
+
+# ANSI escape sequences used to redraw the dashboard in place
+CURSOR_HOME = "\x1b[H"
+ERASE_LINE = "\x1b[K"
+ERASE_BELOW = "\x1b[J"
+LINE_REDRAW = "\x1b[{row};1H\x1b[2K{text}"  # move to row (1-based), clear it, write
+
+# Per-step samples kept in memory (ring buffer length)
+RING_SIZE = 1000
+
+# One ring-buffer row per simulation step
+BUFFER_DTYPE = np.dtype([
+    ('time', 'f4'),
+    ('waiting_time', 'f4'),
+    ('vehicles_count', 'i4'),
+    ('throughput', 'i4'),
+    ('efficiency', 'f4'),
+    ('current_phase', 'i1')
+])
+
+@njit(cache=True, fastmath=True)
+def tail_mean(buf, idx, n):
+    """Mean of the last n samples written to circular buffer buf (idx = total writes)"""
+    s = 0.0
+    for k in range(n):
+        s += buf[(idx - 1 - k) % buf.shape[0]]
+    return s / n
 
 class TrafficDashboard:
     """
@@ -38,16 +89,25 @@ class TrafficDashboard:
         self.sumo_config = sumo_config
         self.model_path = model_path or "ai_controller/training_output/models/traffic_ai_final.pth"
         
-        # Data storage
-        self.data_buffer = {
-            'time': deque(maxlen=1000),
-            'waiting_time': deque(maxlen=1000),
-            'vehicles_count': deque(maxlen=1000),
-            'throughput': deque(maxlen=1000),
-            'efficiency': deque(maxlen=1000),
-            'current_phase': deque(maxlen=1000),
-            'ai_actions': deque(maxlen=100)
-        }
+        # Data storage: ring buffer of per-step samples (_n_samples = total writes)
+        self.data_buffer = np.zeros(RING_SIZE, dtype=BUFFER_DTYPE)
+        self._n_samples = 0
+        self.ai_actions = deque(maxlen=100)
+        
+        # Running sum of the buffered waiting times for the final report
+        self._wt_total = 0.0
+        
+        # Decisions taken per action id over the whole run
+        self._action_hist = np.zeros(len(AITrafficController.ACTION_NAMES), dtype=np.int32)
+        
+        # Last frame written to the terminal (for differential redraws) and the
+        # metrics it showed (to skip refreshes while nothing changes)
+        self._prev_frame = None
+        self._last_state_key = None
+        
+        # Optional per-step JSON Lines log (see start_dashboard)
+        self.log_file = None
+        self._log_fh = None
         
         # Control flags
         self.is_running = False
@@ -59,13 +119,14 @@ class TrafficDashboard:
         print(f"📊 Traffic Dashboard initialized")
         print(f"   Update interval: {self.update_interval}s")
     
-    def start_dashboard(self, gui=True, max_duration=600):
+    def start_dashboard(self, gui=True, max_duration=600, log_file=None):
         """
         Start the traffic control dashboard
         
         Args:
             gui: Whether to show SUMO GUI
             max_duration: Maximum simulation duration in seconds
+            log_file: Optional JSON Lines file that receives one row per step
         """
         print(f"\n🚀 Starting Traffic Control Dashboard...")
         print(f"   GUI: {'Enabled' if gui else 'Disabled'}")
@@ -76,6 +137,11 @@ class TrafficDashboard:
             print("❌ Failed to start SUMO simulation")
             return False
         
+        if log_file:
+            os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+            self.log_file = log_file
+            self._log_fh = open(log_file, 'ab')
+        
         self.is_running = True
         start_time = time.time()
         step_count = 0
@@ -127,15 +193,39 @@ class TrafficDashboard:
         try:
             metrics = self.ai_controller.sumo_ai.get_metrics()
             
-            self.data_buffer['time'].append(current_time)
-            self.data_buffer['waiting_time'].append(metrics['total_waiting_time'])
-            self.data_buffer['vehicles_count'].append(metrics['num_vehicles_waiting'])
-            self.data_buffer['throughput'].append(metrics['throughput'])
-            self.data_buffer['current_phase'].append(metrics['current_phase'])
-            
             # Calculate efficiency
             efficiency = metrics['throughput'] * 10 - metrics['total_waiting_time'] * 0.1
-            self.data_buffer['efficiency'].append(efficiency)
+            
+            slot = self._n_samples % RING_SIZE
+            if self._n_samples >= RING_SIZE:
+                self._wt_total -= float(self.data_buffer['waiting_time'][slot])
+            
+            self.data_buffer[slot] = (
+                current_time,
+                metrics['total_waiting_time'],
+                metrics['num_vehicles_waiting'],
+                metrics['throughput'],
+                efficiency,
+                metrics['current_phase']
+            )
+            self._wt_total += float(self.data_buffer['waiting_time'][slot])
+            self._n_samples += 1
+            
+            # Stream the row to disk so nothing has to be serialized at save time
+            if self._log_fh is not None:
+                row = {
+                    'time': float(current_time),
+                    'waiting_time': float(metrics['total_waiting_time']),
+                    'vehicles_count': int(metrics['num_vehicles_waiting']),
+                    'throughput': int(metrics['throughput']),
+                    'efficiency': float(efficiency),
+                    'current_phase': int(metrics['current_phase'])
+                }
+                if ORJSON_AVAILABLE:
+                    line = orjson.dumps(row)
+                else:
+                    line = json.dumps(row, separators=(',', ':')).encode()
+                self._log_fh.write(line + b'\n')
             
         except Exception as e:
             print(f"⚠️ Error updating data: {e}")
@@ -155,12 +245,12 @@ class TrafficDashboard:
             self.ai_controller._execute_action(action)
             
             # Store action
-            action_names = ['extend_green_5s', 'extend_green_10s', 'switch_to_ew', 'switch_to_ns']
-            self.data_buffer['ai_actions'].append({
+            self.ai_actions.append({
                 'time': traci.simulation.getTime(),
-                'action': action_names[action],
+                'action': AITrafficController.ACTION_NAMES[action],
                 'action_id': action
             })
+            self._action_hist[action] += 1
             
         except Exception as e:
             print(f"❌ Error in AI decision: {e}")
@@ -176,42 +266,81 @@ class TrafficDashboard:
             # Get latest metrics
             metrics = self.ai_controller.sumo_ai.get_metrics()
             
-            # Clear screen and display dashboard
-            os.system('cls' if os.name == 'nt' else 'clear')
+            # Skip the refresh entirely while the displayed metrics are unchanged
+            state_key = (
+                metrics['num_vehicles_waiting'],
+                int(metrics['total_waiting_time']),
+                metrics['current_phase'],
+                metrics['throughput'],
+                self._n_samples > 10,
+                int(self._action_hist.sum())
+            )
+            if state_key == self._last_state_key:
+                return
+            self._last_state_key = state_key
             
-            print("🚦 AI TRAFFIC CONTROL DASHBOARD")
-            print("=" * 50)
-            print(f"⏰ Simulation Time: {current_time:.1f}s")
-            print(f"🚗 Vehicles Waiting: {metrics['num_vehicles_waiting']}")
-            print(f"⏱️ Total Waiting Time: {metrics['total_waiting_time']:.1f}s")
-            print(f"🚦 Current Phase: {metrics['current_phase']}")
-            print(f"📈 Throughput: {metrics['throughput']} vehicles")
-            print(f"🔄 Signal Switches: {self.ai_controller.performance_metrics['total_switches']}")
+            # Build the whole frame first so it reaches the terminal in one write
+            lines = [
+                "🚦 AI TRAFFIC CONTROL DASHBOARD",
+                "=" * 50,
+                f"⏰ Simulation Time: {current_time:.1f}s",
+                f"🚗 Vehicles Waiting: {metrics['num_vehicles_waiting']}",
+                f"⏱️ Total Waiting Time: {metrics['total_waiting_time']:.1f}s",
+                f"🚦 Current Phase: {metrics['current_phase']}",
+                f"📈 Throughput: {metrics['throughput']} vehicles",
+                f"🔄 Signal Switches: {self.ai_controller.performance_metrics['total_switches']}",
+                "",
+                "🤖 Recent AI Actions:"
+            ]
             
             # Display recent AI actions
-            print(f"\n🤖 Recent AI Actions:")
-            recent_actions = list(self.data_buffer['ai_actions'])[-5:]
+            recent_actions = list(self.ai_actions)[-5:]
             for action_data in recent_actions:
-                print(f"   {action_data['time']:.1f}s: {action_data['action']}")
+                lines.append(f"   {action_data['time']:.1f}s: {action_data['action']}")
             
             # Display performance trends
-            if len(self.data_buffer['time']) > 10:
-                print(f"\n📊 Performance Trends:")
-                recent_waiting = list(self.data_buffer['waiting_time'])[-10:]
-                recent_throughput = list(self.data_buffer['throughput'])[-10:]
-                
-                avg_waiting = np.mean(recent_waiting)
-                avg_throughput = np.mean(recent_throughput)
+            if self._n_samples > 10:
+                avg_waiting = tail_mean(self.data_buffer['waiting_time'], self._n_samples, 10)
+                avg_throughput = tail_mean(self.data_buffer['throughput'], self._n_samples, 10)
                 
-                print(f"   Avg Waiting (last 10s): {avg_waiting:.1f}s")
-                print(f"   Avg Throughput (last 10s): {avg_throughput:.1f}")
+                lines.append("")
+                lines.append("📊 Performance Trends:")
+                lines.append(f"   Avg Waiting (last 10s): {avg_waiting:.1f}s")
+                lines.append(f"   Avg Throughput (last 10s): {avg_throughput:.1f}")
+            
+            lines.append("=" * 50)
+            lines.append("Press Ctrl+C to stop")
             
-            print("=" * 50)
-            print("Press Ctrl+C to stop")
+            self._render(lines)
             
         except Exception as e:
             print(f"⚠️ Error updating dashboard: {e}")
     
+    def _render(self, lines):
+        """
+        Draw a dashboard frame, rewriting only the lines that changed
+        
+        Args:
+            lines: Frame contents, one string per terminal row
+        """
+        prev = self._prev_frame
+        if prev is None or len(prev) != len(lines):
+            # Layout changed: cursor home, overwrite each line, erase anything left below
+            out = CURSOR_HOME + (ERASE_LINE + "\n").join(lines) + ERASE_LINE + "\n" + ERASE_BELOW
+        else:
+            out = "".join(
+                LINE_REDRAW.format(row=i + 1, text=line)
+                for i, (old, line) in enumerate(zip(prev, lines)) if old != line
+            )
+            if not out:
+                return
+            # Park the cursor below the frame again
+            out += f"\x1b[{len(lines) + 1};1H"
+        
+        sys.stdout.write(out)
+        sys.stdout.flush()
+        self._prev_frame = lines
+    
     def _generate_final_report(self):
         """
         Generate final performance report
@@ -220,13 +349,14 @@ class TrafficDashboard:
         print("📊 FINAL TRAFFIC CONTROL REPORT")
         print("=" * 60)
         
-        if len(self.data_buffer['time']) > 0:
-            # Calculate statistics
-            total_time = max(self.data_buffer['time']) - min(self.data_buffer['time'])
-            avg_waiting = np.mean(self.data_buffer['waiting_time'])
-            max_waiting = np.max(self.data_buffer['waiting_time'])
-            total_throughput = max(self.data_buffer['throughput'])
-            total_switches = len(self.data_buffer['ai_actions'])
+        if self._n_samples > 0:
+            # Calculate statistics over the buffered samples (row order is irrelevant here)
+            samples = self.data_buffer[:min(self._n_samples, RING_SIZE)]
+            total_time = float(samples['time'].max() - samples['time'].min())
+            avg_waiting = self._wt_total / len(samples)
+            max_waiting = float(samples['waiting_time'].max())
+            total_throughput = int(samples['throughput'].max())
+            total_switches = int(self._action_hist.sum())
             
             print(f"⏱️ Simulation Duration: {total_time:.1f}s")
             print(f"📈 Average Waiting Time: {avg_waiting:.2f}s")
@@ -240,26 +370,43 @@ class TrafficDashboard:
                 print(f"🎯 Processing Rate: {efficiency:.1f} vehicles/min")
             
             # Action breakdown
-            action_counts = {}
-            for action_data in self.data_buffer['ai_actions']:
-                action = action_data['action']
-                action_counts[action] = action_counts.get(action, 0) + 1
+            percentages = self._action_hist / max(1, total_switches) * 100
             
             print(f"\n🤖 AI Action Breakdown:")
-            for action, count in action_counts.items():
-                percentage = (count / total_switches) * 100 if total_switches > 0 else 0
-                print(f"   {action}: {count} ({percentage:.1f}%)")
+            for action, count, percentage in zip(AITrafficController.ACTION_NAMES, self._action_hist, percentages):
+                if count:
+                    print(f"   {action}: {count} ({percentage:.1f}%)")
         
         print("=" * 60)
     
+    def get_samples(self) -> np.ndarray:
+        """
+        Buffered per-step samples in chronological order
+        
+        Returns:
+            Structured array with the fields of BUFFER_DTYPE
+        """
+        if self._n_samples <= RING_SIZE:
+            return self.data_buffer[:self._n_samples].copy()
+        return np.roll(self.data_buffer, -(self._n_samples % RING_SIZE))
+    
     def stop_dashboard(self):
         """
         Stop dashboard and close SUMO
         """
         self.is_running = False
         self.ai_controller.stop_ai_control()
+        self._close_log()
         print("🛑 Dashboard stopped")
     
+    def _close_log(self):
+        """
+        Close the per-step log file if one is open
+        """
+        if self._log_fh is not None:
+            self._log_fh.close()
+            self._log_fh = None
+    
     def save_data(self, filename=None):
         """
         Save collected data to file
@@ -271,15 +418,40 @@ class TrafficDashboard:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"ai_controller/training_output/logs/dashboard_data_{timestamp}.json"
         
-        # Convert deques to lists for JSON serialization
-        data = {}
-        for key, value in self.data_buffer.items():
-            data[key] = list(value)
-        
         os.makedirs(os.path.dirname(filename), exist_ok=True)
         
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+        # Step rows were already streamed to the log file during the run; the
+        # summary file then only points to it and keeps the AI actions
+        if self.log_file is not None:
+            self._close_log()
+            print(f"💾 Dashboard data streamed to: {self.log_file}")
+            data = {'log_file': self.log_file, 'ai_actions': list(self.ai_actions)}
+            if ORJSON_AVAILABLE:
+                with open(filename, 'wb') as f:
+                    f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+            else:
+                with open(filename, 'w') as f:
+                    json.dump(data, f, indent=2)
+            print(f"💾 AI actions saved to: {filename}")
+            return
+        
+        # One list per column, oldest sample first
+        samples = self.get_samples()
+        
+        if ORJSON_AVAILABLE:
+            # orjson serializes the numpy columns directly, without Python lists
+            data = {name: np.ascontiguousarray(samples[name]) for name in BUFFER_DTYPE.names}
+            data['ai_actions'] = list(self.ai_actions)
+            with open(filename, 'wb') as f:
+                f.write(orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_INDENT_2))
+        else:
+            data = {name: samples[name].tolist() for name in BUFFER_DTYPE.names}
+            data['ai_actions'] = list(self.ai_actions)
+            with open(filename, 'w') as f:
+                if UJSON_AVAILABLE:
+                    ujson.dump(data, f, indent=2)
+                else:
+                    json.dump(data, f, indent=2)
         
         print(f"💾 Dashboard data saved to: {filename}")
 
@@ -7,8 +7,10 @@ import os
 import sys
 import time
 import json
-import traci
+import sumolib
+import traci.constants as tc
 import numpy as np
+from collections import deque
 from datetime import datetime
 from typing import Dict, List, Tuple
 import logging
@@ -16,29 +18,154 @@ import logging
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """Fallback decorator so kernels run as plain Python without Numba"""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
 from master_ai_rl_trainer import MasterAIRLTrainer
 
+# Libsumo runs SUMO in-process, so every get/set below is a direct call rather
+# than a socket round-trip. It cannot attach to an already running sumo-gui,
+# so it is opt-in and main() then starts SUMO itself.
+USE_LIBSUMO = os.environ.get('USE_LIBSUMO') == '1'
+if USE_LIBSUMO:
+    import libsumo as traci
+else:
+    import traci
+
+# Simulation driven by main(): started in-process under libsumo, otherwise run
+# separately (e.g. sumo-gui -c fixed_ai_simulation.sumocfg --remote-port 8813)
+SUMO_CONFIG = "fixed_ai_simulation.sumocfg"
+
+@njit(cache=True, fastmath=True)
+def _efficiency_scores(avg_queue):
+    """Throughput, waiting-time and speed scores (0-100) for an average queue length"""
+    return (max(0.0, 100.0 - avg_queue * 2.0),
+            max(0.0, 100.0 - avg_queue * 5.0),
+            max(0.0, 100.0 - avg_queue * 3.0))
+
+# Approach directions, as encoded in vehicle/route IDs (e.g. 'north_1')
+DIRECTIONS = ('north', 'south', 'east', 'west')
+
+def _direction_index(vehicle_id: str) -> int:
+    """Index into DIRECTIONS of the first direction named in the vehicle ID, -1 if none"""
+    for i, direction in enumerate(DIRECTIONS):
+        if direction in vehicle_id:
+            return i
+    return -1
+
+# One row per AI decision: wall-clock time, action id, total queue, total vehicles
+DECISION_DTYPE = np.dtype([('t', 'f8'), ('act', 'i1'), ('q', 'f4'), ('v', 'i4')])
+
 class AITrafficController:
     """AI-controlled traffic light system"""
     
+    # Action id -> name; matches the order of the handlers in self._dispatch
+    ACTION_NAMES = (
+        'change_phase',
+        'extend_green',
+        'reduce_cycle',
+        'coordinate_signals',
+        'emergency_priority',
+        'adaptive_timing',
+        'queue_management',
+        'flow_optimization'
+    )
+    
     def __init__(self):
         self.rl_trainer = MasterAIRLTrainer()
         self.traffic_lights = ['I1', 'I2']  # Traffic light IDs
         self.control_interval = 5  # Control every 5 seconds
-        self.last_control_time = 0
+        self.step_length = 0.1  # Simulation step length in seconds
+        self._control_steps = int(round(self.control_interval / self.step_length))  # 50 steps
         
         # Performance tracking
         self.performance_data = {
             'total_vehicles': 0,
             'waiting_times': [],
-            'queue_lengths': [],
-            'throughput': 0,
-            'ai_decisions': []
+            'queue_lengths': deque(maxlen=100),
+            'throughput': 0
         }
+        self._queue_sum = 0.0  # running sum of performance_data['queue_lengths']
+        
+        # Decision log as a growable structured array (filled prefix: _n_decisions rows)
+        self._decisions = np.empty(2048, dtype=DECISION_DTYPE)
+        self._n_decisions = 0
+        
+        # TraCI subscriptions (set up lazily once SUMO is connected)
+        self._subscribed = False
+        self._controlled_lanes = {}  # tl_id -> controlled lanes (one entry per link)
+        
+        # Vehicles per direction, maintained from departures/arrivals (see _track_vehicles)
+        self._vid_dir = {}  # vehicle id -> index into DIRECTIONS (-1: none)
+        self._dir_counts = [0] * len(DIRECTIONS)
+        
+        # Action handlers indexed by action id
+        self._dispatch = (
+            self._act_change_phase,
+            self._act_extend_green,
+            self._act_reduce_cycle,
+            self._act_coordinate,
+            self._act_emergency_priority,
+            self._act_adaptive_timing,
+            self._act_queue_management,
+            self._act_flow_optimization
+        )
         
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
     
+    def _ensure_subscriptions(self):
+        """Subscribe to the controlled lanes and traffic lights once"""
+        if self._subscribed:
+            return
+        
+        tl_ids = set(traci.trafficlight.getIDList())
+        for tl_id in self.traffic_lights:
+            if tl_id in tl_ids:
+                lanes = traci.trafficlight.getControlledLanes(tl_id)
+                self._controlled_lanes[tl_id] = lanes
+                traci.trafficlight.subscribe(tl_id, [tc.TL_CURRENT_PHASE, tc.TL_PHASE_DURATION])
+                for lane in set(lanes):
+                    traci.lane.subscribe(lane, [tc.LAST_STEP_VEHICLE_HALTING_NUMBER])
+        
+        # Departures/arrivals of each step; seed the counters with vehicles already inside
+        traci.simulation.subscribe([tc.VAR_DEPARTED_VEHICLES_IDS, tc.VAR_ARRIVED_VEHICLES_IDS])
+        self._add_vehicles(traci.vehicle.getIDList())
+        
+        self._subscribed = True
+    
+    def _add_vehicles(self, vehicle_ids):
+        """Classify newly departed vehicles by direction (once per vehicle)"""
+        for vid in vehicle_ids:
+            if vid in self._vid_dir:
+                continue
+            idx = _direction_index(vid)
+            self._vid_dir[vid] = idx
+            if idx >= 0:
+                self._dir_counts[idx] += 1
+    
+    def _track_vehicles(self):
+        """Apply the last step's departures and arrivals to the direction counters"""
+        self._ensure_subscriptions()
+        results = traci.simulation.getSubscriptionResults()
+        if not results:
+            return
+        
+        self._add_vehicles(results[tc.VAR_DEPARTED_VEHICLES_IDS])
+        for vid in results[tc.VAR_ARRIVED_VEHICLES_IDS]:
+            idx = self._vid_dir.pop(vid, -1)
+            if idx >= 0:
+                self._dir_counts[idx] -= 1
+    
     def get_traffic_state(self) -> Dict:
         """Get current traffic state from SUMO"""
         state = {
@@ -52,42 +179,37 @@ class AITrafficController:
         }
         
         try:
-            # Get queue lengths for each traffic light
-            for tl_id in self.traffic_lights:
-                if traci.trafficlight.getIDList() and tl_id in traci.trafficlight.getIDList():
-                    # Get waiting vehicles
-                    waiting_vehicles = traci.trafficlight.getControlledLanes(tl_id)
-                    queue_length = 0
-                    for lane in waiting_vehicles:
-                        queue_length += traci.lane.getLastStepHaltingNumber(lane)
-                    
-                    state['queue_lengths'][tl_id] = queue_length
-                    
-                    # Get current phase
-                    state['current_phase'][tl_id] = traci.trafficlight.getPhase(tl_id)
-                    
-                    # Get phase duration
-                    state['phase_duration'][tl_id] = traci.trafficlight.getPhaseDuration(tl_id)
+            # Lane halting numbers and light phases arrive with each simulation step
+            self._ensure_subscriptions()
+            lane_results = traci.lane.getAllSubscriptionResults()
+            tl_results = traci.trafficlight.getAllSubscriptionResults()
             
-            # Get vehicle counts by direction
-            vehicle_list = traci.vehicle.getIDList()
-            state['vehicle_counts'] = {
-                'north': len([v for v in vehicle_list if 'north' in v]),
-                'south': len([v for v in vehicle_list if 'south' in v]),
-                'east': len([v for v in vehicle_list if 'east' in v]),
-                'west': len([v for v in vehicle_list if 'west' in v])
-            }
+            for tl_id, lanes in self._controlled_lanes.items():
+                # Get waiting vehicles
+                state['queue_lengths'][tl_id] = sum(
+                    lane_results[lane][tc.LAST_STEP_VEHICLE_HALTING_NUMBER] for lane in lanes
+                )
+                
+                # Get current phase and phase duration
+                tl_result = tl_results[tl_id]
+                state['current_phase'][tl_id] = tl_result[tc.TL_CURRENT_PHASE]
+                state['phase_duration'][tl_id] = tl_result[tc.TL_PHASE_DURATION]
+            
+            # Get vehicle counts by direction (kept current by _track_vehicles)
+            state['vehicle_counts'] = dict(zip(DIRECTIONS, self._dir_counts))
             
             # Calculate flow rates
-            for direction in ['north', 'south', 'east', 'west']:
+            for direction in DIRECTIONS:
                 state['flow_rates'][direction] = state['vehicle_counts'][direction] * 10
             
             # Calculate efficiency scores
-            avg_queue = np.mean(list(state['queue_lengths'].values())) if state['queue_lengths'] else 0
+            queues = state['queue_lengths']
+            avg_queue = sum(queues.values()) / len(queues) if queues else 0.0
+            throughput_score, waiting_score, speed_score = _efficiency_scores(float(avg_queue))
             state['efficiency_scores'] = {
-                'throughput': max(0, 100 - avg_queue * 2),
-                'waiting_time': max(0, 100 - avg_queue * 5),
-                'speed': max(0, 100 - avg_queue * 3)
+                'throughput': throughput_score,
+                'waiting_time': waiting_score,
+                'speed': speed_score
             }
             
         except Exception as e:
@@ -98,107 +220,145 @@ class AITrafficController:
     def apply_ai_decision(self, action: int, traffic_state: Dict):
         """Apply AI decision to traffic lights"""
         try:
-            if action == 0:  # Change phase
-                for tl_id in self.traffic_lights:
-                    if tl_id in traci.trafficlight.getIDList():
-                        current_phase = traci.trafficlight.getPhase(tl_id)
-                        new_phase = (current_phase + 1) % 4
-                        traci.trafficlight.setPhase(tl_id, new_phase)
-            
-            elif action == 1:  # Extend green time
-                for tl_id in self.traffic_lights:
-                    if tl_id in traci.trafficlight.getIDList():
-                        current_duration = traci.trafficlight.getPhaseDuration(tl_id)
-                        traci.trafficlight.setPhaseDuration(tl_id, current_duration + 5)
-            
-            elif action == 2:  # Reduce cycle time
-                for tl_id in self.traffic_lights:
-                    if tl_id in traci.trafficlight.getIDList():
-                        current_duration = traci.trafficlight.getPhaseDuration(tl_id)
-                        traci.trafficlight.setPhaseDuration(tl_id, max(10, current_duration - 5))
-            
-            elif action == 3:  # Coordinate signals
-                # Synchronize traffic lights
-                for i, tl_id in enumerate(self.traffic_lights):
-                    if tl_id in traci.trafficlight.getIDList():
-                        offset = i * 2  # Stagger the phases
-                        traci.trafficlight.setPhase(tl_id, (traci.trafficlight.getPhase(tl_id) + offset) % 4)
-            
-            elif action == 4:  # Emergency priority
-                # Set all lights to green for main roads
-                for tl_id in self.traffic_lights:
-                    if tl_id in traci.trafficlight.getIDList():
-                        traci.trafficlight.setPhase(tl_id, 0)  # Green phase
-            
-            elif action == 5:  # Adaptive timing
-                # Adjust timing based on queue lengths
-                for tl_id in self.traffic_lights:
-                    if tl_id in traci.trafficlight.getIDList():
-                        queue_length = traffic_state['queue_lengths'].get(tl_id, 0)
-                        if queue_length > 10:
-                            traci.trafficlight.setPhaseDuration(tl_id, 50)
-                        else:
-                            traci.trafficlight.setPhaseDuration(tl_id, 30)
+            # Fetch the live traffic light IDs once per decision
+            tl_ids = set(traci.trafficlight.getIDList())
             
-            elif action == 6:  # Queue management
-                # Prioritize lanes with longer queues
-                for tl_id in self.traffic_lights:
-                    if tl_id in traci.trafficlight.getIDList():
-                        queue_length = traffic_state['queue_lengths'].get(tl_id, 0)
-                        if queue_length > 15:
-                            traci.trafficlight.setPhase(tl_id, 0)  # Green for main flow
+            self._dispatch[action](tl_ids, traffic_state)
             
-            elif action == 7:  # Flow optimization
-                # Optimize for overall flow
-                for tl_id in self.traffic_lights:
-                    if tl_id in traci.trafficlight.getIDList():
-                        traci.trafficlight.setPhaseDuration(tl_id, 40)  # Balanced timing
-            
-            self.performance_data['ai_decisions'].append({
-                'action': action,
-                'timestamp': time.time(),
-                'traffic_state': traffic_state
-            })
+            self._log_decision(action, traffic_state)
             
         except Exception as e:
             self.logger.error(f"Error applying AI decision: {e}")
     
-    def control_traffic(self, current_time: float):
-        """Main traffic control function"""
-        if current_time - self.last_control_time >= self.control_interval:
-            # Get current traffic state
-            traffic_state = self.get_traffic_state()
-            
-            # Get AI decision
-            action = self.rl_trainer.predict_action(traffic_state)
-            
-            # Apply AI decision
-            self.apply_ai_decision(action, traffic_state)
-            
-            # Update performance tracking
-            self.update_performance_metrics(traffic_state)
-            
-            self.last_control_time = current_time
-            
-            self.logger.info(f"AI Decision at {current_time:.1f}s: Action {action}, "
-                           f"Queues: {traffic_state['queue_lengths']}")
+    def _log_decision(self, action: int, traffic_state: Dict):
+        """Append a compact row for this decision to the decision log"""
+        if self._n_decisions == len(self._decisions):
+            self._decisions = np.resize(self._decisions, 2 * len(self._decisions))
+        
+        self._decisions[self._n_decisions] = (
+            time.time(),
+            action,
+            sum(traffic_state['queue_lengths'].values()),
+            sum(traffic_state['vehicle_counts'].values())
+        )
+        self._n_decisions += 1
+    
+    def get_decision_log(self) -> np.ndarray:
+        """Logged decisions as a structured array with fields t, act, q, v"""
+        return self._decisions[:self._n_decisions]
+    
+    # Handlers read phase and duration from traffic_state, which get_traffic_state
+    # fills from the TraCI subscription results of the current step.
+    
+    def _act_change_phase(self, tl_ids, traffic_state: Dict):
+        """Action 0: advance every light to its next phase"""
+        for tl_id in self.traffic_lights:
+            if tl_id in tl_ids:
+                current_phase = traffic_state['current_phase'][tl_id]
+                new_phase = (current_phase + 1) % 4
+                traci.trafficlight.setPhase(tl_id, new_phase)
+    
+    def _act_extend_green(self, tl_ids, traffic_state: Dict):
+        """Action 1: extend the current green by 5 seconds"""
+        for tl_id in self.traffic_lights:
+            if tl_id in tl_ids:
+                current_duration = traffic_state['phase_duration'][tl_id]
+                traci.trafficlight.setPhaseDuration(tl_id, current_duration + 5)
+    
+    def _act_reduce_cycle(self, tl_ids, traffic_state: Dict):
+        """Action 2: shorten the current phase by 5 seconds (10s minimum)"""
+        for tl_id in self.traffic_lights:
+            if tl_id in tl_ids:
+                current_duration = traffic_state['phase_duration'][tl_id]
+                traci.trafficlight.setPhaseDuration(tl_id, max(10, current_duration - 5))
+    
+    def _act_coordinate(self, tl_ids, traffic_state: Dict):
+        """Action 3: stagger the phases of consecutive lights"""
+        phases = traffic_state['current_phase']
+        targets = [
+            (tl_id, (phases[tl_id] + i * 2) % 4)  # Stagger the phases
+            for i, tl_id in enumerate(self.traffic_lights) if tl_id in tl_ids
+        ]
+        for tl_id, phase in targets:
+            traci.trafficlight.setPhase(tl_id, phase)
+    
+    def _act_emergency_priority(self, tl_ids, traffic_state: Dict):
+        """Action 4: set all lights to green for main roads"""
+        for tl_id in self.traffic_lights:
+            if tl_id in tl_ids:
+                traci.trafficlight.setPhase(tl_id, 0)  # Green phase
+    
+    def _act_adaptive_timing(self, tl_ids, traffic_state: Dict):
+        """Action 5: adjust timing based on queue lengths"""
+        for tl_id in self.traffic_lights:
+            if tl_id in tl_ids:
+                queue_length = traffic_state['queue_lengths'].get(tl_id, 0)
+                if queue_length > 10:
+                    traci.trafficlight.setPhaseDuration(tl_id, 50)
+                else:
+                    traci.trafficlight.setPhaseDuration(tl_id, 30)
+    
+    def _act_queue_management(self, tl_ids, traffic_state: Dict):
+        """Action 6: give green to the main flow at lights with long queues"""
+        for tl_id in self.traffic_lights:
+            if tl_id in tl_ids:
+                queue_length = traffic_state['queue_lengths'].get(tl_id, 0)
+                if queue_length > 15:
+                    traci.trafficlight.setPhase(tl_id, 0)  # Green for main flow
+    
+    def _act_flow_optimization(self, tl_ids, traffic_state: Dict):
+        """Action 7: balanced timing for overall flow"""
+        for tl_id in self.traffic_lights:
+            if tl_id in tl_ids:
+                traci.trafficlight.setPhaseDuration(tl_id, 40)  # Balanced timing
+    
+    def control_traffic(self, step: int):
+        """Main traffic control function, called once per simulation step"""
+        try:
+            self._track_vehicles()
+        except Exception as e:
+            self.logger.error(f"Error tracking vehicles: {e}")
+        
+        # First decision after one full interval, then every interval
+        if step % self._control_steps or step == 0:
+            return
+        
+        # Get current traffic state
+        traffic_state = self.get_traffic_state()
+        
+        # Get AI decision
+        action = self.rl_trainer.predict_action(traffic_state)
+        
+        # Apply AI decision
+        self.apply_ai_decision(action, traffic_state)
+        
+        # Update performance tracking
+        self.update_performance_metrics(traffic_state)
+        
+        self.logger.info(f"AI Decision at {step * self.step_length:.1f}s: Action {action}, "
+                       f"Queues: {traffic_state['queue_lengths']}")
     
     def update_performance_metrics(self, traffic_state: Dict):
         """Update performance metrics"""
         self.performance_data['total_vehicles'] = sum(traffic_state['vehicle_counts'].values())
-        self.performance_data['queue_lengths'].append(sum(traffic_state['queue_lengths'].values()))
+        queue_lengths = self.performance_data['queue_lengths']
+        total_queue = sum(traffic_state['queue_lengths'].values())
         
-        if len(self.performance_data['queue_lengths']) > 100:
-            self.performance_data['queue_lengths'] = self.performance_data['queue_lengths'][-100:]
+        # Keep the running sum in step with the bounded window
+        if len(queue_lengths) == queue_lengths.maxlen:
+            self._queue_sum -= queue_lengths[0]
+        queue_lengths.append(total_queue)
+        self._queue_sum += total_queue
     
     def get_performance_report(self) -> Dict:
         """Get performance report"""
-        avg_queue = np.mean(self.performance_data['queue_lengths']) if self.performance_data['queue_lengths'] else 0
+        queue_lengths = self.performance_data['queue_lengths']
+        avg_queue = self._queue_sum / len(queue_lengths) if queue_lengths else 0
         
         return {
             'total_vehicles_processed': self.performance_data['total_vehicles'],
             'average_queue_length': avg_queue,
-            'ai_decisions_made': len(self.performance_data['ai_decisions']),
+            'ai_decisions_made': self._n_decisions,
             'efficiency_score': max(0, 100 - avg_queue * 2),
             'timestamp': datetime.now().isoformat()
         }
@@ -207,10 +367,14 @@ def main():
     """Main function to run AI-controlled simulation"""
     print("AI Traffic Controller Starting...")
     
-    # Connect to SUMO
+    # Connect to SUMO (libsumo cannot attach to a running instance, so start one)
     try:
-        traci.init(port=8813)
-        print("Connected to SUMO")
+        if USE_LIBSUMO:
+            traci.start([sumolib.checkBinary('sumo'), "-c", SUMO_CONFIG])
+            print("Started SUMO in-process (libsumo)")
+        else:
+            traci.init(port=8813)
+            print("Connected to SUMO")
     except Exception as e:
         print(f"Failed to connect to SUMO: {e}")
         return
@@ -226,10 +390,8 @@ def main():
     
     try:
         while step < max_steps:
-            current_time = step * 0.1
-            
             # Control traffic with AI
-            controller.control_traffic(current_time)
+            controller.control_traffic(step)
             
             # Step simulation
             traci.simulationStep()
@@ -1,10 +1,12 @@
 """
 Database connection and utilities for Smart Traffic Simulator
 """
+import asyncio
 import logging
 from typing import Optional
 import motor.motor_asyncio
 import redis.asyncio as redis
+from fastapi import Request
 from pymongo import MongoClient
 
 from config.settings import settings
@@ -16,6 +18,12 @@ mongodb_client: Optional[motor.motor_asyncio.AsyncIOMotorClient] = None
 mongodb_database: Optional[motor.motor_asyncio.AsyncIOMotorDatabase] = None
 redis_client: Optional[redis.Redis] = None
 
+# Serves the filtered, newest-first AI model listing without an in-memory sort
+AI_MODELS_LIST_INDEX = [("model_type", 1), ("status", 1), ("created_at", -1)]
+
+# Upper bound on pooled Redis connections shared by all requests
+REDIS_MAX_CONNECTIONS = 32
+
 # Development mode flag
 DEV_MODE = True  # Set to False when databases are available
 
@@ -37,14 +45,20 @@ async def init_database():
         await mongodb_client.admin.command('ping')
         logger.info("MongoDB connection established successfully")
         
-        # Initialize Redis connection
-        redis_client = redis.from_url(
+        # Ensure indexes (no-op when they already exist)
+        await _ensure_indexes(mongodb_database)
+        
+        # Initialize Redis connection (one pooled client, shared by every request)
+        redis_pool = redis.ConnectionPool.from_url(
             settings.REDIS_URL,
             db=settings.REDIS_DB,
-            decode_responses=True
+            decode_responses=True,
+            max_connections=REDIS_MAX_CONNECTIONS
         )
+        # from_pool hands the pool to the client, so closing the client also disconnects it
+        redis_client = redis.Redis.from_pool(redis_pool)
         
-        # Test Redis connection
+        # Test Redis connection (also opens the first pooled connection before any request)
         await redis_client.ping()
         logger.info("Redis connection established successfully")
         
@@ -54,6 +68,23 @@ async def init_database():
         DEV_MODE = True
 
 
+async def _ensure_indexes(database):
+    """Create the indexes behind the routers' filter + sort and point-lookup queries"""
+    # Independent builds, issued together so startup waits for the slowest one only
+    await asyncio.gather(
+        # Equality fields first, then the sort key (also serves timestamp range scans)
+        database.ai_models.create_index(AI_MODELS_LIST_INDEX),
+        database.camera_feeds.create_index([("intersection_id", 1), ("status", 1), ("timestamp", -1)]),
+        database.performance_metrics.create_index([("intersection_id", 1), ("timestamp", -1)]),
+        database.simulation_runs.create_index([("intersection_id", 1), ("status", 1), ("start_time", -1)]),
+        database.traffic_data.create_index([("intersection_id", 1), ("timestamp", -1)]),
+        
+        # Point lookups by ID
+        database.camera_feeds.create_index("camera_id"),
+        database.simulation_runs.create_index("run_id")
+    )
+
+
 async def close_database():
     """Close database connections"""
     global mongodb_client, redis_client
@@ -94,6 +125,11 @@ def get_redis_client():
     return redis_client
 
 
+def get_redis(request: Request) -> Optional[redis.Redis]:
+    """FastAPI dependency: the Redis client stored on app.state at startup"""
+    return request.app.state.redis
+
+
 # Database collections
 def get_traffic_collection():
     """Get traffic data collection"""
@@ -102,6 +138,11 @@ def get_traffic_collection():
     return get_mongodb_database().traffic_data
 
 
+def get_traffic(request: Request):
+    """FastAPI dependency: the traffic data collection stored on app.state at startup"""
+    return request.app.state.traffic_collection
+
+
 def get_simulation_collection():
     """Get simulation runs collection"""
     if DEV_MODE:
@@ -116,6 +157,13 @@ def get_ai_models_collection():
     return get_mongodb_database().ai_models
 
 
+def get_model_files_bucket():
+    """Get GridFS bucket holding uploaded AI model files"""
+    if DEV_MODE:
+        return None
+    return motor.motor_asyncio.AsyncIOMotorGridFSBucket(get_mongodb_database(), bucket_name="model_files")
+
+
 def get_camera_feeds_collection():
     """Get camera feeds collection"""
     if DEV_MODE:
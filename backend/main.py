@@ -9,14 +9,21 @@ from typing import Dict, Any
 
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.backends.redis import RedisBackend
 import uvicorn
 
 # Add the parent directory to the path to import config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config.settings import settings
-from backend.database import init_database, close_database
+from backend.database import (
+    init_database, close_database, get_camera_feeds_collection, get_redis_client, get_traffic_collection
+)
+from backend.redis_batcher import RedisPublishBatcher
+from backend.write_behind import WriteBehindUpdater
 from backend.routers import traffic, simulation, ai, metrics, camera
 
 
@@ -38,12 +45,37 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting Smart Traffic Simulator API...")
     await init_database()
+    app.state.redis = get_redis_client()
+    app.state.traffic_collection = get_traffic_collection()
     logger.info("Database initialized successfully")
     
+    # Response cache for slow-changing aggregates (in-process when Redis is unavailable)
+    FastAPICache.init(
+        RedisBackend(app.state.redis) if app.state.redis else InMemoryBackend(),
+        prefix="sts-cache"
+    )
+    
+    # Handlers queue their Redis publishes; one task sends them in pipelined batches
+    app.state.publisher = None
+    if app.state.redis:
+        app.state.publisher = RedisPublishBatcher(app.state.redis)
+        app.state.publisher.start()
+    
+    # Camera metadata writes are coalesced and applied in bulk
+    app.state.camera_writer = None
+    camera_feeds = get_camera_feeds_collection()
+    if camera_feeds is not None:
+        app.state.camera_writer = WriteBehindUpdater(camera_feeds, "camera_id", on_flush=camera.invalidate_feeds)
+        app.state.camera_writer.start()
+    
     yield
     
     # Shutdown
     logger.info("Shutting down Smart Traffic Simulator API...")
+    if app.state.publisher:
+        await app.state.publisher.close()
+    if app.state.camera_writer:
+        await app.state.camera_writer.close()
     await close_database()
     logger.info("Database connection closed")
 
@@ -53,6 +85,7 @@ app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
     description="AI-powered traffic control system with digital twin visualization",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -0,0 +1,88 @@
+"""
+Batched Redis publishing for Smart Traffic Simulator
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Union
+
+import redis.asyncio as redis
+from fastapi import Request
+
+logger = logging.getLogger(__name__)
+
+# A batch is sent once it holds BATCH_MAX messages or BATCH_WINDOW seconds after its first one
+BATCH_MAX = 100
+BATCH_WINDOW = 0.02
+
+# Queued by close(); tells the flusher to send what it has and exit
+_STOP = object()
+
+
+class RedisPublishBatcher:
+    """Queues PUBLISH and XADD commands and sends them in pipelined batches from one background task"""
+
+    def __init__(self, redis_client: redis.Redis, batch_max: int = BATCH_MAX, batch_window: float = BATCH_WINDOW):
+        self.redis_client = redis_client
+        self.batch_max = batch_max
+        self.batch_window = batch_window
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the background flusher"""
+        self._task = asyncio.create_task(self._run())
+
+    def enqueue(self, channel: str, message: Union[str, bytes]):
+        """Queue a message for publishing; returns immediately"""
+        self._queue.put_nowait(("publish", (channel, message)))
+
+    def enqueue_stream(self, stream: str, fields: Dict[str, Any], maxlen: int):
+        """Queue an entry for a capped stream (trimmed approximately to maxlen); returns immediately"""
+        self._queue.put_nowait(("xadd", (stream, fields, "*", maxlen, True)))
+
+    async def close(self):
+        """Publish everything queued so far and stop the flusher"""
+        if self._task is None:
+            return
+        self._queue.put_nowait(_STOP)
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        """Collect queued messages into batches and send each batch as one pipeline"""
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+
+            # Give concurrent requests a moment to add to this batch unless it is already full
+            if self._queue.qsize() < self.batch_max - 1:
+                await asyncio.sleep(self.batch_window)
+
+            stop = False
+            while len(batch) < self.batch_max and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            await self._send(batch)
+            if stop:
+                return
+
+    async def _send(self, batch):
+        """Send a batch in a single round trip"""
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for command, args in batch:
+                getattr(pipe, command)(*args)
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error sending {len(batch)} Redis commands: {e}")
+
+
+def get_publisher(request: Request) -> Optional[RedisPublishBatcher]:
+    """FastAPI dependency: the publish batcher stored on app.state at startup"""
+    return request.app.state.publisher
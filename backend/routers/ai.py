@@ -1,19 +1,33 @@
 """
 AI router for Smart Traffic Simulator
 """
+import asyncio
+import hashlib
 import logging
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
-from fastapi import APIRouter, HTTPException, Query, UploadFile, File
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from gridfs.errors import NoFile
 from pydantic import BaseModel
 
-from backend.database import get_ai_models_collection, get_redis_client
-from config.settings import settings
+from backend.database import AI_MODELS_LIST_INDEX, get_ai_models_collection, get_model_files_bucket, get_redis_client
+from backend.redis_batcher import RedisPublishBatcher, get_publisher
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Large fields left out of the model listing; fetch a single model for the full document
+AI_MODEL_LIST_PROJECTION = {"parameters": 0, "performance_metrics": 0}
+
+# Redis cache of the /status/current response; dropped whenever a model's status changes
+CURRENT_STATUS_KEY = "ai:current"
+CURRENT_STATUS_TTL = 2  # seconds
+
+# Model uploads are streamed to GridFS in chunks of this size
+UPLOAD_CHUNK_SIZE = 1 << 20
+
 
 class AIModel(BaseModel):
     """AI model model"""
@@ -55,7 +69,11 @@ async def get_ai_models(
             query["status"] = status
         
         # Get data
-        cursor = collection.find(query).sort("created_at", -1).limit(limit)
+        cursor = collection.find(query, projection=AI_MODEL_LIST_PROJECTION)
+        if model_type and status:
+            # Equality on both prefix fields: the compound index also yields created_at order
+            cursor = cursor.hint(AI_MODELS_LIST_INDEX)
+        cursor = cursor.sort("created_at", -1).limit(limit)
         data = await cursor.to_list(length=limit)
         
         return data
@@ -72,7 +90,7 @@ async def create_ai_model(model: AIModel) -> Dict[str, Any]:
         collection = get_ai_models_collection()
         
         # Insert model
-        result = await collection.insert_one(model.dict())
+        result = await collection.insert_one(model.model_dump())
         
         return {
             "model_id": model.model_id,
@@ -105,27 +123,32 @@ async def get_ai_model(model_id: str) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+async def _set_model_status(model_id: str, status: str, channel: str, publisher: RedisPublishBatcher) -> None:
+    """Set a model's status and notify the AI controller; 404 if the model does not exist"""
+    collection = get_ai_models_collection()
+    
+    # Update model status
+    result = await collection.update_one(
+        {"model_id": model_id},
+        {"$set": {"status": status}}
+    )
+    
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="AI model not found")
+    
+    # Drop the cached status before responding; the AI controller notification is queued
+    await get_redis_client().delete(CURRENT_STATUS_KEY)
+    publisher.enqueue(channel, model_id)
+
+
 @router.put("/{model_id}/activate")
-async def activate_ai_model(model_id: str) -> Dict[str, Any]:
+async def activate_ai_model(
+    model_id: str,
+    publisher: RedisPublishBatcher = Depends(get_publisher)
+) -> Dict[str, Any]:
     """Activate an AI model"""
     try:
-        collection = get_ai_models_collection()
-        
-        # Update model status
-        result = await collection.update_one(
-            {"model_id": model_id},
-            {"$set": {"status": "active"}}
-        )
-        
-        if result.matched_count == 0:
-            raise HTTPException(status_code=404, detail="AI model not found")
-        
-        # Publish to Redis for AI controller
-        redis_client = get_redis_client()
-        await redis_client.publish(
-            "ai:activate",
-            model_id
-        )
+        await _set_model_status(model_id, "active", "ai:activate", publisher)
         
         return {
             "model_id": model_id,
@@ -141,26 +164,13 @@ async def activate_ai_model(model_id: str) -> Dict[str, Any]:
 
 
 @router.put("/{model_id}/deactivate")
-async def deactivate_ai_model(model_id: str) -> Dict[str, Any]:
+async def deactivate_ai_model(
+    model_id: str,
+    publisher: RedisPublishBatcher = Depends(get_publisher)
+) -> Dict[str, Any]:
     """Deactivate an AI model"""
     try:
-        collection = get_ai_models_collection()
-        
-        # Update model status
-        result = await collection.update_one(
-            {"model_id": model_id},
-            {"$set": {"status": "inactive"}}
-        )
-        
-        if result.matched_count == 0:
-            raise HTTPException(status_code=404, detail="AI model not found")
-        
-        # Publish to Redis for AI controller
-        redis_client = get_redis_client()
-        await redis_client.publish(
-            "ai:deactivate",
-            model_id
-        )
+        await _set_model_status(model_id, "inactive", "ai:deactivate", publisher)
         
         return {
             "model_id": model_id,
@@ -175,15 +185,49 @@ async def deactivate_ai_model(model_id: str) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+class ModelIdList(BaseModel):
+    """Batch of AI model IDs"""
+    model_ids: List[str]
+
+
+@router.put("/deactivate")
+async def deactivate_ai_models(
+    batch: ModelIdList,
+    publisher: RedisPublishBatcher = Depends(get_publisher)
+) -> Dict[str, Any]:
+    """Deactivate several AI models concurrently"""
+    try:
+        results = await asyncio.gather(
+            *(_set_model_status(model_id, "inactive", "ai:deactivate", publisher) for model_id in batch.model_ids),
+            return_exceptions=True
+        )
+        
+        for result in results:
+            if isinstance(result, Exception) and not isinstance(result, HTTPException):
+                raise result
+        
+        return {
+            "deactivated": [m for m, r in zip(batch.model_ids, results) if r is None],
+            "not_found": [m for m, r in zip(batch.model_ids, results) if isinstance(r, HTTPException)],
+            "message": "AI models deactivated"
+        }
+        
+    except Exception as e:
+        logger.error(f"Error deactivating AI models: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
 @router.post("/decision")
-async def make_ai_decision(decision: AIDecision) -> Dict[str, Any]:
+async def make_ai_decision(
+    decision: AIDecision,
+    publisher: RedisPublishBatcher = Depends(get_publisher)
+) -> Dict[str, Any]:
     """Make an AI decision"""
     try:
-        # Publish decision to Redis for AI controller
-        redis_client = get_redis_client()
-        await redis_client.publish(
+        # Publish decision to Redis for AI controller (JSON, naive datetimes as UTC)
+        publisher.enqueue(
             f"ai:decision:{decision.intersection_id}",
-            str(decision.dict())
+            orjson.dumps(decision.model_dump(), option=orjson.OPT_NAIVE_UTC)
         )
         
         return {
@@ -203,21 +247,29 @@ async def make_ai_decision(decision: AIDecision) -> Dict[str, Any]:
 async def get_current_ai_status() -> Dict[str, Any]:
     """Get current AI status"""
     try:
+        redis_client = get_redis_client()
+        cached = await redis_client.get(CURRENT_STATUS_KEY)
+        if cached:
+            return orjson.loads(cached)
+        
         collection = get_ai_models_collection()
         
         # Get active model
         active_model = await collection.find_one({"status": "active"})
         
         if not active_model:
-            return {"status": "inactive", "message": "No active AI model"}
+            current = {"status": "inactive", "message": "No active AI model"}
+        else:
+            current = {
+                "status": "active",
+                "model_id": active_model["model_id"],
+                "model_name": active_model["model_name"],
+                "model_type": active_model["model_type"],
+                "version": active_model["version"]
+            }
         
-        return {
-            "status": "active",
-            "model_id": active_model["model_id"],
-            "model_name": active_model["model_name"],
-            "model_type": active_model["model_type"],
-            "version": active_model["version"]
-        }
+        await redis_client.set(CURRENT_STATUS_KEY, orjson.dumps(current), ex=CURRENT_STATUS_TTL)
+        return current
         
     except Exception as e:
         logger.error(f"Error fetching current AI status: {e}")
@@ -236,27 +288,58 @@ async def upload_model_file(
         if not file.filename.endswith(('.pth', '.pt', '.h5', '.pb')):
             raise HTTPException(status_code=400, detail="Invalid file type")
         
-        # Save file
-        file_path = f"{settings.MODELS_DIR}/{model_id}_{file.filename}"
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        
-        # Update model in database
+        # The file is only stored for a known model
         collection = get_ai_models_collection()
-        await collection.update_one(
+        if not await collection.find_one({"model_id": model_id}, projection={"_id": 1}):
+            raise HTTPException(status_code=404, detail="AI model not found")
+        
+        # Stream file into GridFS; memory use stays at one chunk
+        bucket = get_model_files_bucket()
+        grid_in = bucket.open_upload_stream(
+            f"{model_id}_{file.filename}",
+            metadata={"model_id": model_id, "model_type": model_type}
+        )
+        digest = hashlib.sha256()
+        try:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+                await grid_in.write(chunk)
+        except Exception:
+            await grid_in.abort()
+            raise
+        await grid_in.close()
+        file_id = grid_in._id
+        sha256 = digest.hexdigest()
+        
+        # Point the model at the new file; the returned pre-update document names the file it replaces
+        previous = await collection.find_one_and_update(
             {"model_id": model_id},
             {
                 "$set": {
-                    "file_path": file_path,
+                    "file_id": file_id,
+                    "sha256": sha256,
                     "updated_at": datetime.utcnow()
                 }
-            }
+            },
+            projection={"file_id": 1, "_id": 0}
         )
         
+        if previous is None:
+            # Model deleted while uploading: do not leave the file unreferenced
+            await bucket.delete(file_id)
+            raise HTTPException(status_code=404, detail="AI model not found")
+        
+        old_file_id = previous.get("file_id")
+        if old_file_id is not None:
+            try:
+                await bucket.delete(old_file_id)
+            except NoFile:
+                pass
+        
         return {
             "model_id": model_id,
-            "file_path": file_path,
+            "file_id": str(file_id),
+            "sha256": sha256,
             "message": "Model file uploaded successfully"
         }
         
@@ -1,19 +1,69 @@
 """
 Camera router for Smart Traffic Simulator
 """
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+import os
+import shutil
+from typing import Iterable, List, Dict, Any, Optional
 from datetime import datetime
 
-from fastapi import APIRouter, HTTPException, Query, UploadFile, File
-from pydantic import BaseModel
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile, File
+from fastapi.exceptions import RequestValidationError
+from fastapi_cache import FastAPICache
+from fastapi_cache.decorator import cache
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
 
-from backend.database import get_camera_feeds_collection, get_redis_client
+from backend.database import get_camera_feeds_collection
+from backend.redis_batcher import RedisPublishBatcher, get_publisher
+from backend.ttl_cache import TTLCache
+from backend.write_behind import WriteBehindUpdater, get_camera_writer
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Cached active-camera listing; cleared whenever a feed is created or changes status
+CAMERAS_CACHE_NAMESPACE = "cameras"
+CAMERAS_CACHE_EXPIRE = 10  # seconds
+
+
+def _active_cameras_cache_key(*args, **kwargs) -> str:
+    """Fixed cache key for the parameterless /status/active listing (also usable as its key_builder)"""
+    return f"{FastAPICache.get_prefix()}:{CAMERAS_CACHE_NAMESPACE}:active"
+
+
+async def _clear_active_cameras_cache():
+    """Delete the cached active-camera listing"""
+    # By key on the backend: FastAPICache.clear always clears a namespace, which on Redis
+    # runs KEYS over the whole keyspace
+    try:
+        await FastAPICache.get_backend().clear(key=_active_cameras_cache_key())
+    except KeyError:
+        # InMemoryBackend raises when nothing is cached under the key
+        pass
+
+# Detections are appended to a per-camera stream capped at roughly this many entries
+DETECTION_STREAM_MAXLEN = 10000
+
+# Hot feed lookups (detail pages poll these) are answered in-process for a couple of seconds;
+# entries are dropped when this process changes the feed (for write-behind updates, once they land)
+_feed_cache = TTLCache()
+_stream_cache = TTLCache()
+
+# Documents fetched per round trip when streaming large result sets
+CURSOR_BATCH_SIZE = 1000
+
+# Camera config uploads are copied to disk in chunks of this size
+UPLOAD_CHUNK_SIZE = 1 << 16
+
+# Accepted camera config file extensions (compared lower-case)
+_ALLOWED_SUFFIXES = frozenset({'.json', '.yaml', '.yml', '.xml', '.txt'})
+
+# Camera IDs and config types become part of the saved file name (and of a metadata field path)
+_PATH_COMPONENT_PATTERN = r"^[A-Za-z0-9_-]+$"
+
 
 class CameraFeed(BaseModel):
     """Camera feed model"""
@@ -22,7 +72,7 @@ class CameraFeed(BaseModel):
     timestamp: datetime
     feed_url: str
     status: str  # active, inactive, processing
-    metadata: Dict[str, Any] = {}
+    metadata: Dict[str, Any] = Field(default_factory=dict)
 
 
 class VehicleDetection(BaseModel):
@@ -34,6 +84,10 @@ class VehicleDetection(BaseModel):
     confidence: float
 
 
+# Built once at import; detections are validated straight from the raw JSON body
+_DETECTION_ADAPTER = TypeAdapter(VehicleDetection)
+
+
 @router.get("/")
 async def get_camera_feeds(
     intersection_id: Optional[str] = Query(default=None),
@@ -63,20 +117,27 @@ async def get_camera_feeds(
 
 
 @router.post("/")
-async def create_camera_feed(feed: CameraFeed) -> Dict[str, Any]:
+async def create_camera_feed(
+    feed: CameraFeed,
+    publisher: RedisPublishBatcher = Depends(get_publisher)
+) -> Dict[str, Any]:
     """Create new camera feed"""
     try:
         collection = get_camera_feeds_collection()
         
+        # Dump once: encode the payload before insert_one adds an ObjectId _id to the dict
+        document = feed.model_dump()
+        payload = orjson.dumps(document, option=orjson.OPT_NAIVE_UTC)
+        
         # Insert feed
-        result = await collection.insert_one(feed.dict())
+        result = await collection.insert_one(document)
         
         # Publish to Redis for camera integration
-        redis_client = get_redis_client()
-        await redis_client.publish(
+        publisher.enqueue(
             "camera:new_feed",
-            str(feed.dict())
+            payload
         )
+        await _clear_active_cameras_cache()
         
         return {
             "camera_id": feed.camera_id,
@@ -95,10 +156,13 @@ async def get_camera_feed(camera_id: str) -> Dict[str, Any]:
         collection = get_camera_feeds_collection()
         
         # Get feed
-        feed = await collection.find_one({"camera_id": camera_id})
-        
-        if not feed:
-            raise HTTPException(status_code=404, detail="Camera feed not found")
+        feed = _feed_cache.get(camera_id)
+        if feed is None:
+            feed = await collection.find_one({"camera_id": camera_id})
+            
+            if not feed:
+                raise HTTPException(status_code=404, detail="Camera feed not found")
+            _feed_cache.set(camera_id, feed)
         
         return feed
         
@@ -112,7 +176,8 @@ async def get_camera_feed(camera_id: str) -> Dict[str, Any]:
 @router.put("/{camera_id}/status")
 async def update_camera_status(
     camera_id: str,
-    status: str = Query(..., description="New status")
+    status: str = Query(..., description="New status"),
+    publisher: RedisPublishBatcher = Depends(get_publisher)
 ) -> Dict[str, Any]:
     """Update camera feed status"""
     try:
@@ -129,12 +194,15 @@ async def update_camera_status(
             }
         )
         
+        # Clear the active-camera cache after the write so it cannot be refilled with the old list
+        await _clear_active_cameras_cache()
+        
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Camera feed not found")
+        invalidate_feeds((camera_id,))
         
         # Publish to Redis
-        redis_client = get_redis_client()
-        await redis_client.publish(
+        publisher.enqueue(
             f"camera:status:{camera_id}",
             status
         )
@@ -152,15 +220,31 @@ async def update_camera_status(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
-@router.post("/detection")
-async def process_vehicle_detection(detection: VehicleDetection) -> Dict[str, Any]:
+@router.post(
+    "/detection",
+    openapi_extra={
+        "requestBody": {
+            "content": {"application/json": {"schema": VehicleDetection.model_json_schema()}},
+            "required": True
+        }
+    }
+)
+async def process_vehicle_detection(
+    request: Request,
+    publisher: RedisPublishBatcher = Depends(get_publisher)
+) -> Dict[str, Any]:
     """Process vehicle detection from camera feed"""
     try:
-        # Publish detection to Redis for processing
-        redis_client = get_redis_client()
-        await redis_client.publish(
-            f"camera:detection:{detection.camera_id}",
-            str(detection.dict())
+        detection = _DETECTION_ADAPTER.validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    
+    try:
+        # Append detection to the camera's Redis stream so consumers can catch up after reconnecting
+        publisher.enqueue_stream(
+            f"detections:{detection.camera_id}",
+            {"data": orjson.dumps(detection.model_dump(), option=orjson.OPT_NAIVE_UTC)},
+            DETECTION_STREAM_MAXLEN
         )
         
         return {
@@ -181,11 +265,17 @@ async def get_camera_stream(camera_id: str) -> Dict[str, Any]:
     try:
         collection = get_camera_feeds_collection()
         
-        # Get camera feed
-        feed = await collection.find_one({"camera_id": camera_id})
-        
-        if not feed:
-            raise HTTPException(status_code=404, detail="Camera feed not found")
+        # Get camera feed (only the fields the response uses)
+        feed = _stream_cache.get(camera_id)
+        if feed is None:
+            feed = await collection.find_one(
+                {"camera_id": camera_id},
+                projection={"feed_url": 1, "status": 1, "metadata": 1, "_id": 0}
+            )
+            
+            if not feed:
+                raise HTTPException(status_code=404, detail="Camera feed not found")
+            _stream_cache.set(camera_id, feed)
         
         if feed["status"] != "active":
             raise HTTPException(status_code=400, detail="Camera feed is not active")
@@ -204,36 +294,51 @@ async def get_camera_stream(camera_id: str) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+def invalidate_feeds(camera_ids: Iterable[str]):
+    """Drop the cached lookups for feeds this process has changed"""
+    for camera_id in camera_ids:
+        _feed_cache.invalidate(camera_id)
+        _stream_cache.invalidate(camera_id)
+
+
+def _copy_upload(source, file_path: str) -> None:
+    """Copy an upload to file_path chunk by chunk"""
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(source, buffer, UPLOAD_CHUNK_SIZE)
+
+
 @router.post("/upload")
 async def upload_camera_config(
     file: UploadFile = File(...),
-    camera_id: str = Query(...),
-    config_type: str = Query(..., description="Configuration type: calibration, mapping, etc.")
+    camera_id: str = Query(..., pattern=_PATH_COMPONENT_PATTERN),
+    config_type: str = Query(..., pattern=_PATH_COMPONENT_PATTERN,
+                             description="Configuration type: calibration, mapping, etc."),
+    camera_writer: WriteBehindUpdater = Depends(get_camera_writer)
 ) -> Dict[str, Any]:
     """Upload camera configuration file"""
     try:
-        # Validate file type
-        allowed_types = ['.json', '.yaml', '.yml', '.xml', '.txt']
-        if not any(file.filename.endswith(ext) for ext in allowed_types):
+        # Validate file name and type; with camera_id and config_type restricted to
+        # _PATH_COMPONENT_PATTERN, a bare name keeps file_path inside camera_configs
+        filename = file.filename or ''
+        if not filename or os.path.basename(filename) != filename:
+            raise HTTPException(status_code=400, detail="Invalid file name")
+        if os.path.splitext(filename)[1].lower() not in _ALLOWED_SUFFIXES:
             raise HTTPException(status_code=400, detail="Invalid file type")
         
-        # Save file
-        file_path = f"{settings.DATA_DIR}/camera_configs/{camera_id}_{config_type}_{file.filename}"
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        if file.size is not None and file.size > settings.MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="File too large")
         
-        # Update camera feed metadata
-        collection = get_camera_feeds_collection()
-        await collection.update_one(
-            {"camera_id": camera_id},
-            {
-                "$set": {
-                    f"metadata.{config_type}_config": file_path,
-                    "updated_at": datetime.utcnow()
-                }
-            }
-        )
+        # Save file off the event loop
+        file_path = f"{settings.DATA_DIR}/camera_configs/{camera_id}_{config_type}_{filename}"
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, _copy_upload, file.file, file_path)
+        
+        # Update camera feed metadata (applied in bulk with other pending camera updates;
+        # the writer drops the cached lookups for this feed once the update has landed)
+        camera_writer.set(camera_id, {
+            f"metadata.{config_type}_config": file_path,
+            "updated_at": datetime.utcnow()
+        })
         
         return {
             "camera_id": camera_id,
@@ -250,24 +355,20 @@ async def upload_camera_config(
 
 
 @router.get("/status/active")
+@cache(expire=CAMERAS_CACHE_EXPIRE, namespace=CAMERAS_CACHE_NAMESPACE, key_builder=_active_cameras_cache_key)
 async def get_active_cameras() -> List[Dict[str, Any]]:
     """Get all active camera feeds"""
     try:
         collection = get_camera_feeds_collection()
         
-        # Get active feeds
-        cursor = collection.find({"status": "active"})
-        feeds = await cursor.to_list(length=None)
+        # Active feeds, fetching only the listed fields; the projected documents are
+        # already the response shape, so they are returned as drained from the cursor
+        cursor = collection.find(
+            {"status": "active"},
+            projection={"camera_id": 1, "intersection_id": 1, "feed_url": 1, "timestamp": 1, "_id": 0}
+        ).batch_size(CURSOR_BATCH_SIZE)
         
-        return [
-            {
-                "camera_id": feed["camera_id"],
-                "intersection_id": feed["intersection_id"],
-                "feed_url": feed["feed_url"],
-                "timestamp": feed["timestamp"]
-            }
-            for feed in feeds
-        ]
+        return await cursor.to_list(length=None)
         
     except Exception as e:
         logger.error(f"Error fetching active cameras: {e}")
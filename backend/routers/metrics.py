@@ -2,10 +2,12 @@
 Metrics router for Smart Traffic Simulator
 """
 import logging
+from operator import itemgetter
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 
 from fastapi import APIRouter, HTTPException, Query
+from fastapi_cache.decorator import cache
 from pydantic import BaseModel
 
 from backend.database import get_metrics_collection, get_traffic_collection
@@ -14,6 +16,29 @@ from config.settings import settings
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Aggregates are served from the response cache for this long; metrics arrive at inference cadence
+METRICS_CACHE_EXPIRE = 30  # seconds
+
+# Trend series are downsampled server-side to at most this many points
+TREND_MAX_POINTS = 500
+
+# Document field behind each trend metric
+TREND_FIELDS = {
+    "wait_time": "$metrics.average_wait_time",
+    "queue_length": "$metrics.queue_length",
+    "throughput": "$metrics.throughput",
+    "efficiency": "$comparison.efficiency_improvement"
+}
+
+
+# (timestamp, value) of a trend bucket
+_bucket_point = itemgetter("timestamp", "value")
+
+
+def _field_or_zero(field: str) -> Dict[str, Any]:
+    """Aggregation expression for a numeric field, counting a missing field as 0"""
+    return {"$ifNull": [field, 0]}
+
 
 class PerformanceMetrics(BaseModel):
     """Performance metrics model"""
@@ -61,6 +86,7 @@ async def get_performance_metrics(
 
 
 @router.get("/summary")
+@cache(expire=METRICS_CACHE_EXPIRE, namespace="metrics")
 async def get_metrics_summary(
     intersection_id: str = Query(default=settings.INTERSECTION_ID),
     time_window: int = Query(default=3600, description="Time window in seconds")
@@ -73,13 +99,23 @@ async def get_metrics_summary(
         end_time = datetime.utcnow()
         start_time = end_time - timedelta(seconds=time_window)
         
-        # Get metrics for the time window
-        cursor = collection.find({
-            "intersection_id": intersection_id,
-            "timestamp": {"$gte": start_time, "$lte": end_time}
-        })
+        # Summarize the time window in the database
+        cursor = collection.aggregate([
+            {"$match": {
+                "intersection_id": intersection_id,
+                "timestamp": {"$gte": start_time, "$lte": end_time}
+            }},
+            {"$group": {
+                "_id": None,
+                "total_runs": {"$sum": 1},
+                "avg_wait_time": {"$avg": _field_or_zero("$metrics.average_wait_time")},
+                "avg_queue_length": {"$avg": _field_or_zero("$metrics.queue_length")},
+                "total_throughput": {"$sum": _field_or_zero("$metrics.throughput")},
+                "efficiency_improvement": {"$avg": _field_or_zero("$comparison.efficiency_improvement")}
+            }}
+        ])
         
-        data = await cursor.to_list(length=None)
+        data = await cursor.to_list(length=1)
         
         if not data:
             return {
@@ -88,34 +124,16 @@ async def get_metrics_summary(
                 "message": "No metrics data available"
             }
         
-        # Calculate summary statistics
-        total_runs = len(data)
-        avg_wait_time = 0
-        avg_queue_length = 0
-        total_throughput = 0
-        efficiency_improvement = 0
-        
-        for entry in data:
-            metrics = entry.get("metrics", {})
-            avg_wait_time += metrics.get("average_wait_time", 0)
-            avg_queue_length += metrics.get("queue_length", 0)
-            total_throughput += metrics.get("throughput", 0)
-            
-            comparison = entry.get("comparison", {})
-            efficiency_improvement += comparison.get("efficiency_improvement", 0)
-        
-        avg_wait_time /= total_runs if total_runs > 0 else 1
-        avg_queue_length /= total_runs if total_runs > 0 else 1
-        efficiency_improvement /= total_runs if total_runs > 0 else 1
+        summary = data[0]
         
         return {
             "intersection_id": intersection_id,
             "time_window": time_window,
-            "total_runs": total_runs,
-            "average_wait_time": round(avg_wait_time, 2),
-            "average_queue_length": round(avg_queue_length, 2),
-            "total_throughput": total_throughput,
-            "efficiency_improvement": round(efficiency_improvement, 2),
+            "total_runs": summary["total_runs"],
+            "average_wait_time": round(summary["avg_wait_time"], 2),
+            "average_queue_length": round(summary["avg_queue_length"], 2),
+            "total_throughput": summary["total_throughput"],
+            "efficiency_improvement": round(summary["efficiency_improvement"], 2),
             "timestamp": end_time
         }
         
@@ -125,6 +143,7 @@ async def get_metrics_summary(
 
 
 @router.get("/comparison")
+@cache(expire=METRICS_CACHE_EXPIRE, namespace="metrics")
 async def get_performance_comparison(
     intersection_id: str = Query(default=settings.INTERSECTION_ID),
     time_window: int = Query(default=3600, description="Time window in seconds")
@@ -137,13 +156,24 @@ async def get_performance_comparison(
         end_time = datetime.utcnow()
         start_time = end_time - timedelta(seconds=time_window)
         
-        # Get metrics for the time window
-        cursor = collection.find({
-            "intersection_id": intersection_id,
-            "timestamp": {"$gte": start_time, "$lte": end_time}
-        })
+        # Average both control modes over the time window in the database
+        cursor = collection.aggregate([
+            {"$match": {
+                "intersection_id": intersection_id,
+                "timestamp": {"$gte": start_time, "$lte": end_time}
+            }},
+            {"$group": {
+                "_id": None,
+                "ai_wait_time": {"$avg": _field_or_zero("$comparison.ai_wait_time")},
+                "traditional_wait_time": {"$avg": _field_or_zero("$comparison.traditional_wait_time")},
+                "ai_queue_length": {"$avg": _field_or_zero("$comparison.ai_queue_length")},
+                "traditional_queue_length": {"$avg": _field_or_zero("$comparison.traditional_queue_length")},
+                "ai_throughput": {"$avg": _field_or_zero("$comparison.ai_throughput")},
+                "traditional_throughput": {"$avg": _field_or_zero("$comparison.traditional_throughput")}
+            }}
+        ])
         
-        data = await cursor.to_list(length=None)
+        data = await cursor.to_list(length=1)
         
         if not data:
             return {
@@ -152,30 +182,14 @@ async def get_performance_comparison(
                 "message": "No comparison data available"
             }
         
-        # Calculate comparison statistics
-        ai_wait_times = []
-        traditional_wait_times = []
-        ai_queue_lengths = []
-        traditional_queue_lengths = []
-        ai_throughputs = []
-        traditional_throughputs = []
-        
-        for entry in data:
-            comparison = entry.get("comparison", {})
-            ai_wait_times.append(comparison.get("ai_wait_time", 0))
-            traditional_wait_times.append(comparison.get("traditional_wait_time", 0))
-            ai_queue_lengths.append(comparison.get("ai_queue_length", 0))
-            traditional_queue_lengths.append(comparison.get("traditional_queue_length", 0))
-            ai_throughputs.append(comparison.get("ai_throughput", 0))
-            traditional_throughputs.append(comparison.get("traditional_throughput", 0))
-        
-        # Calculate averages
-        avg_ai_wait_time = sum(ai_wait_times) / len(ai_wait_times) if ai_wait_times else 0
-        avg_traditional_wait_time = sum(traditional_wait_times) / len(traditional_wait_times) if traditional_wait_times else 0
-        avg_ai_queue_length = sum(ai_queue_lengths) / len(ai_queue_lengths) if ai_queue_lengths else 0
-        avg_traditional_queue_length = sum(traditional_queue_lengths) / len(traditional_queue_lengths) if traditional_queue_lengths else 0
-        avg_ai_throughput = sum(ai_throughputs) / len(ai_throughputs) if ai_throughputs else 0
-        avg_traditional_throughput = sum(traditional_throughputs) / len(traditional_throughputs) if traditional_throughputs else 0
+        # Averages
+        averages = data[0]
+        avg_ai_wait_time = averages["ai_wait_time"]
+        avg_traditional_wait_time = averages["traditional_wait_time"]
+        avg_ai_queue_length = averages["ai_queue_length"]
+        avg_traditional_queue_length = averages["traditional_queue_length"]
+        avg_ai_throughput = averages["ai_throughput"]
+        avg_traditional_throughput = averages["traditional_throughput"]
         
         # Calculate improvements
         wait_time_improvement = ((avg_traditional_wait_time - avg_ai_wait_time) / avg_traditional_wait_time * 100) if avg_traditional_wait_time > 0 else 0
@@ -209,6 +223,7 @@ async def get_performance_comparison(
 
 
 @router.get("/trends")
+@cache(expire=METRICS_CACHE_EXPIRE, namespace="metrics")
 async def get_metrics_trends(
     intersection_id: str = Query(default=settings.INTERSECTION_ID),
     metric: str = Query(default="wait_time", description="Metric to analyze"),
@@ -222,11 +237,23 @@ async def get_metrics_trends(
         end_time = datetime.utcnow()
         start_time = end_time - timedelta(seconds=time_window)
         
-        # Get metrics for the time window
-        cursor = collection.find({
-            "intersection_id": intersection_id,
-            "timestamp": {"$gte": start_time, "$lte": end_time}
-        }).sort("timestamp", 1)
+        # Downsample in the database: at most TREND_MAX_POINTS time buckets, each
+        # reported at its first timestamp with the mean metric value (unknown metrics read 0)
+        field = TREND_FIELDS.get(metric)
+        cursor = collection.aggregate([
+            {"$match": {
+                "intersection_id": intersection_id,
+                "timestamp": {"$gte": start_time, "$lte": end_time}
+            }},
+            {"$bucketAuto": {
+                "groupBy": "$timestamp",
+                "buckets": TREND_MAX_POINTS,
+                "output": {
+                    "timestamp": {"$min": "$timestamp"},
+                    "value": {"$avg": _field_or_zero(field) if field else 0}
+                }
+            }}
+        ])
         
         data = await cursor.to_list(length=None)
         
@@ -238,23 +265,12 @@ async def get_metrics_trends(
                 "message": "No trend data available"
             }
         
-        # Extract trend data
+        # Buckets come back in time order; one pass splits them into the two series
         timestamps = []
         values = []
-        
-        for entry in data:
-            timestamps.append(entry["timestamp"].isoformat())
-            
-            if metric == "wait_time":
-                values.append(entry.get("metrics", {}).get("average_wait_time", 0))
-            elif metric == "queue_length":
-                values.append(entry.get("metrics", {}).get("queue_length", 0))
-            elif metric == "throughput":
-                values.append(entry.get("metrics", {}).get("throughput", 0))
-            elif metric == "efficiency":
-                values.append(entry.get("comparison", {}).get("efficiency_improvement", 0))
-            else:
-                values.append(0)
+        for timestamp, value in map(_bucket_point, data):
+            timestamps.append(timestamp.isoformat())
+            values.append(value)
         
         return {
             "intersection_id": intersection_id,
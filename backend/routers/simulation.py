@@ -2,18 +2,42 @@
 Simulation router for Smart Traffic Simulator
 """
 import logging
+import uuid
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
-from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from redis.asyncio import Redis
 
-from backend.database import get_simulation_collection, get_redis_client
+from backend.database import get_redis, get_simulation_collection
+from backend.redis_batcher import RedisPublishBatcher, get_publisher
+from backend.ttl_cache import TTLCache
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Polled run lookups are answered in-process for a couple of seconds; stop drops the entry
+_run_cache = TTLCache()
+
+# Redis copy of the running simulation, kept by start/stop so status polls skip Mongo;
+# it expires when the configured duration is over
+CURRENT_SIMULATION_KEY = "sim:current"
+
+
+async def _cache_current_simulation(redis_client: Redis, run_id: str, intersection_id: str,
+                                    start_time: datetime, remaining: float):
+    """Store the running simulation for /status/current until its configured end"""
+    if remaining < 1:
+        return
+    await redis_client.set(
+        CURRENT_SIMULATION_KEY,
+        orjson.dumps({"run_id": run_id, "intersection_id": intersection_id, "start_time": start_time}),
+        ex=int(remaining)
+    )
+
 
 class SimulationConfig(BaseModel):
     """Simulation configuration model"""
@@ -21,7 +45,7 @@ class SimulationConfig(BaseModel):
     duration: int  # Simulation duration in seconds
     traffic_density: float  # Traffic density (0.0 to 1.0)
     ai_enabled: bool = True
-    parameters: Dict[str, Any] = {}
+    parameters: Dict[str, Any] = Field(default_factory=dict)
 
 
 class SimulationRun(BaseModel):
@@ -64,30 +88,40 @@ async def get_simulation_runs(
 
 
 @router.post("/start")
-async def start_simulation(config: SimulationConfig) -> Dict[str, Any]:
+async def start_simulation(
+    config: SimulationConfig,
+    publisher: RedisPublishBatcher = Depends(get_publisher),
+    redis_client: Redis = Depends(get_redis)
+) -> Dict[str, Any]:
     """Start a new simulation"""
     try:
         collection = get_simulation_collection()
         
-        # Create simulation run
-        run_id = f"sim_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
+        # Create simulation run (one clock read for both the ID and the start time)
+        now = datetime.utcnow()
+        # Random suffix keeps IDs distinct across workers and restarts within the same second
+        run_id = f"sim_{now:%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:8]}"
         simulation_run = SimulationRun(
             run_id=run_id,
             intersection_id=config.intersection_id,
-            start_time=datetime.utcnow(),
+            start_time=now,
             status="running",
             config=config
         )
         
+        # Dump once: encode the payload before insert_one adds an ObjectId _id to the dict
+        document = simulation_run.model_dump()
+        payload = orjson.dumps(document, option=orjson.OPT_NAIVE_UTC)
+        
         # Insert into database
-        result = await collection.insert_one(simulation_run.dict())
+        result = await collection.insert_one(document)
         
         # Publish to Redis for simulation controller
-        redis_client = get_redis_client()
-        await redis_client.publish(
+        publisher.enqueue(
             "simulation:start",
-            str(simulation_run.dict())
+            payload
         )
+        await _cache_current_simulation(redis_client, run_id, config.intersection_id, now, config.duration)
         
         return {
             "run_id": run_id,
@@ -107,10 +141,13 @@ async def get_simulation_run(run_id: str) -> Dict[str, Any]:
         collection = get_simulation_collection()
         
         # Get simulation run
-        simulation = await collection.find_one({"run_id": run_id})
-        
-        if not simulation:
-            raise HTTPException(status_code=404, detail="Simulation run not found")
+        simulation = _run_cache.get(run_id)
+        if simulation is None:
+            simulation = await collection.find_one({"run_id": run_id})
+            
+            if not simulation:
+                raise HTTPException(status_code=404, detail="Simulation run not found")
+            _run_cache.set(run_id, simulation)
         
         return simulation
         
@@ -122,7 +159,11 @@ async def get_simulation_run(run_id: str) -> Dict[str, Any]:
 
 
 @router.post("/{run_id}/stop")
-async def stop_simulation(run_id: str) -> Dict[str, Any]:
+async def stop_simulation(
+    run_id: str,
+    publisher: RedisPublishBatcher = Depends(get_publisher),
+    redis_client: Redis = Depends(get_redis)
+) -> Dict[str, Any]:
     """Stop a running simulation"""
     try:
         collection = get_simulation_collection()
@@ -138,12 +179,16 @@ async def stop_simulation(run_id: str) -> Dict[str, Any]:
             }
         )
         
+        # Drop the cached running simulation only once Mongo no longer reports it as running,
+        # otherwise a status poll in between would cache it again
+        await redis_client.delete(CURRENT_SIMULATION_KEY)
+        
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Simulation run not found")
+        _run_cache.invalidate(run_id)
         
         # Publish to Redis for simulation controller
-        redis_client = get_redis_client()
-        await redis_client.publish(
+        publisher.enqueue(
             "simulation:stop",
             run_id
         )
@@ -167,8 +212,11 @@ async def get_simulation_results(run_id: str) -> Dict[str, Any]:
     try:
         collection = get_simulation_collection()
         
-        # Get simulation run
-        simulation = await collection.find_one({"run_id": run_id})
+        # Get simulation run (status and results only)
+        simulation = await collection.find_one(
+            {"run_id": run_id},
+            projection={"status": 1, "results": 1, "_id": 0}
+        )
         
         if not simulation:
             raise HTTPException(status_code=404, detail="Simulation run not found")
@@ -186,23 +234,43 @@ async def get_simulation_results(run_id: str) -> Dict[str, Any]:
 
 
 @router.get("/status/current")
-async def get_current_simulation_status() -> Dict[str, Any]:
+async def get_current_simulation_status(
+    redis_client: Redis = Depends(get_redis)
+) -> Dict[str, Any]:
     """Get current simulation status"""
     try:
-        collection = get_simulation_collection()
-        
-        # Get currently running simulation
-        running_simulation = await collection.find_one({"status": "running"})
+        now = datetime.utcnow()
         
-        if not running_simulation:
-            return {"status": "idle", "message": "No simulation currently running"}
+        # Running simulation from Redis; Mongo only on a miss
+        cached = await redis_client.get(CURRENT_SIMULATION_KEY)
+        if cached:
+            running_simulation = orjson.loads(cached)
+            running_simulation["start_time"] = datetime.fromisoformat(running_simulation["start_time"])
+        else:
+            collection = get_simulation_collection()
+            running_simulation = await collection.find_one(
+                {"status": "running"},
+                projection={"run_id": 1, "intersection_id": 1, "start_time": 1, "config.duration": 1, "_id": 0}
+            )
+            
+            if not running_simulation:
+                return {"status": "idle", "message": "No simulation currently running"}
+            
+            elapsed = (now - running_simulation["start_time"]).total_seconds()
+            await _cache_current_simulation(
+                redis_client,
+                running_simulation["run_id"],
+                running_simulation["intersection_id"],
+                running_simulation["start_time"],
+                running_simulation.get("config", {}).get("duration", 0) - elapsed
+            )
         
         return {
             "status": "running",
             "run_id": running_simulation["run_id"],
             "intersection_id": running_simulation["intersection_id"],
             "start_time": running_simulation["start_time"],
-            "duration": (datetime.utcnow() - running_simulation["start_time"]).total_seconds()
+            "duration": (now - running_simulation["start_time"]).total_seconds()
         }
         
     except Exception as e:
@@ -5,15 +5,23 @@ import logging
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 
+import orjson
 from fastapi import APIRouter, HTTPException, Query, Depends
 from pydantic import BaseModel
+from redis.asyncio import Redis
 
-from backend.database import get_traffic_collection, get_redis_client, DEV_MODE
+from backend.database import get_redis, get_traffic, DEV_MODE
+from backend.redis_batcher import RedisPublishBatcher, get_publisher
+from backend.ttl_cache import TTLCache
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Latest real-time snapshot per intersection, shared by polling dashboards; concurrent
+# misses for the same intersection wait on a single Redis read
+REALTIME_CACHE_TTL = 0.5  # seconds
+_realtime_cache = TTLCache(ttl=REALTIME_CACHE_TTL)
 
 class TrafficData(BaseModel):
     """Traffic data model"""
@@ -39,7 +47,8 @@ async def get_traffic_data(
     intersection_id: str = Query(default=settings.INTERSECTION_ID),
     limit: int = Query(default=100, le=1000),
     start_time: Optional[datetime] = Query(default=None),
-    end_time: Optional[datetime] = Query(default=None)
+    end_time: Optional[datetime] = Query(default=None),
+    collection=Depends(get_traffic)
 ) -> List[Dict[str, Any]]:
     """Get traffic data for an intersection"""
     if DEV_MODE:
@@ -64,8 +73,6 @@ async def get_traffic_data(
         ]
     
     try:
-        collection = get_traffic_collection()
-        
         # Build query
         query = {"intersection_id": intersection_id}
         if start_time or end_time:
@@ -87,7 +94,11 @@ async def get_traffic_data(
 
 
 @router.post("/")
-async def create_traffic_data(data: TrafficData) -> Dict[str, Any]:
+async def create_traffic_data(
+    data: TrafficData,
+    collection=Depends(get_traffic),
+    publisher: Optional[RedisPublishBatcher] = Depends(get_publisher)
+) -> Dict[str, Any]:
     """Create new traffic data entry"""
     if DEV_MODE:
         # Mock response for development
@@ -97,17 +108,18 @@ async def create_traffic_data(data: TrafficData) -> Dict[str, Any]:
         }
     
     try:
-        collection = get_traffic_collection()
+        # Dump once: encode the payload before insert_one adds an ObjectId _id to the dict
+        document = data.model_dump()
+        payload = orjson.dumps(document, option=orjson.OPT_NAIVE_UTC)
         
         # Insert data
-        result = await collection.insert_one(data.dict())
+        result = await collection.insert_one(document)
         
-        # Publish to Redis for real-time updates
-        redis_client = get_redis_client()
-        if redis_client:
-            await redis_client.publish(
+        # Publish to Redis for real-time updates (pipelined with other queued publishes)
+        if publisher:
+            publisher.enqueue(
                 f"traffic:{data.intersection_id}",
-                str(data.dict())
+                payload
             )
         
         return {
@@ -123,7 +135,8 @@ async def create_traffic_data(data: TrafficData) -> Dict[str, Any]:
 @router.get("/metrics")
 async def get_traffic_metrics(
     intersection_id: str = Query(default=settings.INTERSECTION_ID),
-    time_window: int = Query(default=3600, description="Time window in seconds")
+    time_window: int = Query(default=3600, description="Time window in seconds"),
+    collection=Depends(get_traffic)
 ) -> TrafficMetrics:
     """Get traffic metrics for an intersection"""
     if DEV_MODE:
@@ -138,42 +151,40 @@ async def get_traffic_metrics(
         )
     
     try:
-        collection = get_traffic_collection()
-        
         # Calculate time range
         end_time = datetime.utcnow()
         start_time = end_time - timedelta(seconds=time_window)
         
-        # Get data for the time window
-        cursor = collection.find({
-            "intersection_id": intersection_id,
-            "timestamp": {"$gte": start_time, "$lte": end_time}
-        })
-        
-        data = await cursor.to_list(length=None)
+        # Reduce every lane sample in the time window in the database; documents without
+        # lanes are kept through the unwind so they still count as data found
+        cursor = collection.aggregate([
+            {"$match": {
+                "intersection_id": intersection_id,
+                "timestamp": {"$gte": start_time, "$lte": end_time}
+            }},
+            {"$project": {"_id": 0, "lane": {"$objectToArray": "$lane_data"}}},
+            {"$unwind": {"path": "$lane", "preserveNullAndEmptyArrays": True}},
+            {"$group": {
+                "_id": None,
+                "lane_samples": {"$sum": {"$cond": [{"$ifNull": ["$lane", False]}, 1, 0]}},
+                "wait_time_total": {"$sum": "$lane.v.wait_time"},
+                "queue_length": {"$sum": "$lane.v.queue_length"},
+                "throughput": {"$sum": "$lane.v.throughput"}
+            }}
+        ])
+        
+        data = await cursor.to_list(length=1)
         
         if not data:
             raise HTTPException(status_code=404, detail="No traffic data found")
         
-        # Calculate metrics
-        total_vehicles = sum(
-            sum(lane.get("throughput", 0) for lane in entry["lane_data"].values())
-            for entry in data
-        )
-        
-        wait_times = []
-        queue_lengths = []
-        throughputs = []
-        
-        for entry in data:
-            for lane_data in entry["lane_data"].values():
-                wait_times.append(lane_data.get("wait_time", 0))
-                queue_lengths.append(lane_data.get("queue_length", 0))
-                throughputs.append(lane_data.get("throughput", 0))
-        
-        average_wait_time = sum(wait_times) / len(wait_times) if wait_times else 0
-        queue_length = sum(queue_lengths)
-        throughput = sum(throughputs)
+        # Calculate metrics (a missing lane value counts as 0, as in the average)
+        totals = data[0]
+        lane_samples = totals["lane_samples"]
+        average_wait_time = totals["wait_time_total"] / lane_samples if lane_samples else 0
+        queue_length = totals["queue_length"]
+        throughput = totals["throughput"]
+        total_vehicles = throughput
         
         return TrafficMetrics(
             intersection_id=intersection_id,
@@ -193,14 +204,16 @@ async def get_traffic_metrics(
 
 @router.get("/realtime")
 async def get_realtime_traffic(
-    intersection_id: str = Query(default=settings.INTERSECTION_ID)
+    intersection_id: str = Query(default=settings.INTERSECTION_ID),
+    redis_client: Redis = Depends(get_redis)
 ) -> Dict[str, Any]:
     """Get real-time traffic data from Redis"""
     try:
-        redis_client = get_redis_client()
-        
         # Get latest data from Redis
-        latest_data = await redis_client.get(f"traffic_latest:{intersection_id}")
+        latest_data = await _realtime_cache.get_or_load(
+            intersection_id,
+            lambda: redis_client.get(f"traffic_latest:{intersection_id}")
+        )
         
         if not latest_data:
             raise HTTPException(status_code=404, detail="No real-time data available")
@@ -0,0 +1,66 @@
+"""
+Short-lived in-process caching for Smart Traffic Simulator
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+# Defaults for hot point lookups: a couple of seconds of staleness at most
+CACHE_TTL = 2.0  # seconds
+CACHE_MAXSIZE = 256
+
+
+class TTLCache:
+    """Least-recently-used cache whose entries also expire ttl seconds after they are stored"""
+
+    def __init__(self, ttl: float = CACHE_TTL, maxsize: int = CACHE_MAXSIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._loading: Dict[Hashable, asyncio.Future] = {}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for key, or None if it is missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        """Store value under key, evicting the least recently used entry when full"""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        """Drop key so the next lookup goes to the source"""
+        self._entries.pop(key, None)
+
+    async def get_or_load(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Optional[Any]:
+        """Return the cached value for key, awaiting load() on a miss; concurrent misses share one load"""
+        value = self.get(key)
+        if value is not None:
+            return value
+        loading = self._loading.get(key)
+        if loading is None:
+            loading = asyncio.ensure_future(self._load(key, load))
+            self._loading[key] = loading
+        # Shielded so a cancelled request does not cancel the load other requests are waiting on
+        return await asyncio.shield(loading)
+
+    async def _load(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Optional[Any]:
+        """Run one load for key; a None result is handed to the waiters but not cached"""
+        try:
+            value = await load()
+            if value is not None:
+                self.set(key, value)
+            return value
+        finally:
+            del self._loading[key]
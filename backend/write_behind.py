@@ -0,0 +1,83 @@
+"""
+Write-behind batching of MongoDB field updates for Smart Traffic Simulator
+"""
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import Request
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Pending updates are flushed every FLUSH_INTERVAL seconds, or sooner once FLUSH_MAX documents are waiting
+FLUSH_INTERVAL = 0.2
+FLUSH_MAX = 500
+
+
+class WriteBehindUpdater:
+    """Coalesces $set updates per document key and applies them with one unordered bulk_write"""
+
+    def __init__(self, collection, key_field: str, flush_interval: float = FLUSH_INTERVAL, flush_max: int = FLUSH_MAX,
+                 on_flush: Optional[Callable[[List[Any]], None]] = None):
+        self.collection = collection
+        self.key_field = key_field
+        self.on_flush = on_flush  # called with the flushed keys once their updates have been applied
+        self.flush_interval = flush_interval
+        self.flush_max = flush_max
+        self._pending: Dict[Any, Dict[str, Any]] = {}
+        self._full = asyncio.Event()
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the background flusher"""
+        self._task = asyncio.create_task(self._run())
+
+    def set(self, key: Any, fields: Dict[str, Any]):
+        """Queue a $set of fields on the document whose key_field equals key; returns immediately"""
+        self._pending.setdefault(key, {}).update(fields)
+        if len(self._pending) >= self.flush_max:
+            self._full.set()
+
+    async def close(self):
+        """Apply everything queued so far and stop the flusher"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._full.set()
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        """Flush on every interval tick, or early when enough documents are waiting"""
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self._flush()
+        
+        # Updates queued while the last pass was awaiting bulk_write
+        await self._flush()
+
+    async def _flush(self):
+        """Apply the pending updates in a single round trip"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        try:
+            await self.collection.bulk_write(
+                [UpdateOne({self.key_field: key}, {"$set": fields}) for key, fields in pending.items()],
+                ordered=False
+            )
+        except Exception as e:
+            logger.error(f"Error applying {len(pending)} batched updates: {e}")
+        if self.on_flush:
+            self.on_flush(list(pending))
+
+
+def get_camera_writer(request: Request) -> Optional[WriteBehindUpdater]:
+    """FastAPI dependency: the camera feed metadata writer stored on app.state at startup"""
+    return request.app.state.camera_writer
@@ -11,7 +11,9 @@ import json
 import threading
 import subprocess
 import shutil
+from collections import deque
 from datetime import datetime
+from itertools import islice
 from flask import Flask, jsonify, request, send_from_directory
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
@@ -30,14 +32,17 @@ except ImportError:
 app = Flask(__name__)
 CORS(app)
 
+# Metric snapshots and AI decisions kept in memory (oldest dropped first)
+HISTORY_MAXLEN = 1000
+
 class TrafficAPI:
     """Main API class for traffic control"""
     
     def __init__(self):
         self.controller = None
         self.simulation_running = False
-        self.metrics_history = []
-        self.ai_decisions = []
+        self.metrics_history = deque(maxlen=HISTORY_MAXLEN)
+        self.ai_decisions = deque(maxlen=HISTORY_MAXLEN)
         self.start_time = None
         self.uploaded_video_path = None
         self.unified_ai_controller = None
@@ -294,6 +299,8 @@ class TrafficAPI:
                 # Check if simulation is actually running (user clicked Run in SUMO)
                 try:
                     import traci
+                    # Polled directly: this thread never steps the simulation, so a subscription
+                    # result would never be refreshed here
                     current_time = traci.simulation.getTime()
                     if not ai_control_started and current_time > 0:
                         # User clicked Run in SUMO, start AI control
@@ -363,7 +370,7 @@ class TrafficAPI:
     def get_ai_decisions(self):
         """Get recent AI decisions"""
         return {
-            'decisions': self.ai_decisions[-10:],  # Last 10 decisions
+            'decisions': list(islice(self.ai_decisions, max(0, len(self.ai_decisions) - 10), None)),  # Last 10 decisions
             'total_decisions': len(self.ai_decisions)
         }
 
@@ -12,6 +12,7 @@ import traci
 import subprocess
 import threading
 from datetime import datetime
+from analyze_and_replicate_video import VIDEO_ANALYSIS_FILES, find_video_analysis, load_video_analysis
 from final_rl_integration_solution import create_final_rl_master_ai
 
 class CompleteAISimulation:
@@ -55,23 +56,22 @@ class CompleteAISimulation:
     def load_video_analysis(self):
         """Load video analysis data for comparison"""
         try:
-            with open('video_analysis.json', 'r') as f:
-                data = json.load(f)
-                patterns = data['patterns']
-                
-                # Update real traffic baseline
-                self.performance_data['real_vs_ai_comparison']['real_traffic'] = {
-                    'avg_waiting_time': patterns['average_waiting_time'],
-                    'avg_vehicles': patterns['average_vehicles'],
-                    'flow_rate': patterns['average_flow_rate'],
-                    'efficiency': 65.0,  # Baseline efficiency
-                    'total_time_saved': 0
-                }
-                
-                print(f"📊 Loaded video analysis:")
-                print(f"   🚗 Real traffic vehicles: {patterns['average_vehicles']:.1f}")
-                print(f"   ⏱️ Real waiting time: {patterns['average_waiting_time']:.1f}s")
-                print(f"   📈 Real flow rate: {patterns['average_flow_rate']:.1f} vehicles/min")
+            data = load_video_analysis()
+            patterns = data['patterns']
+            
+            # Update real traffic baseline
+            self.performance_data['real_vs_ai_comparison']['real_traffic'] = {
+                'avg_waiting_time': patterns['average_waiting_time'],
+                'avg_vehicles': patterns['average_vehicles'],
+                'flow_rate': patterns['average_flow_rate'],
+                'efficiency': 65.0,  # Baseline efficiency
+                'total_time_saved': 0
+            }
+            
+            print(f"📊 Loaded video analysis:")
+            print(f"   🚗 Real traffic vehicles: {patterns['average_vehicles']:.1f}")
+            print(f"   ⏱️ Real waiting time: {patterns['average_waiting_time']:.1f}s")
+            print(f"   📈 Real flow rate: {patterns['average_flow_rate']:.1f} vehicles/min")
         except Exception as e:
             print(f"⚠️ Could not load video analysis: {e}")
     
@@ -448,11 +448,12 @@ def main():
     required_files = [
         'working_traffic_network.net.xml',
         'working_traffic_routes.rou.xml',
-        'working_traffic.sumocfg',
-        'video_analysis.json'
+        'working_traffic.sumocfg'
     ]
     
     missing_files = [f for f in required_files if not os.path.exists(f)]
+    if find_video_analysis() is None:
+        missing_files.append(' or '.join(VIDEO_ANALYSIS_FILES))
     if missing_files:
         print(f"❌ Missing files: {missing_files}")
         return
@@ -83,6 +83,9 @@ class Settings(BaseSettings):
     MODELS_DIR: str = Field(default="data/models", env="MODELS_DIR")
     LOGS_DIR: str = Field(default="logs", env="LOGS_DIR")
     
+    # Uploads
+    MAX_UPLOAD_BYTES: int = Field(default=10 * 1024 * 1024, env="MAX_UPLOAD_BYTES")
+    
     class Config:
         env_file = ".env"
         case_sensitive = True